@@ -7,54 +7,239 @@ Enhanced with DSPy Signatures for structured, predictable outputs.
 
 import os
 import json
-from typing import Dict, List, Tuple, Any
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple, Any
 import pandas as pd
 import datetime as dt
-from openai import OpenAI
 
-from constants import DAYS, SHIFT_TIMES
+from constants import DAYS, shift_hours as _shift_len
 
-# Initialize OpenAI client
-client = None
 try:
-    api_key = os.getenv("OpenAI_API_KEY")
-    if api_key:
-        client = OpenAI(api_key=api_key)
-except Exception as e:
-    print(f"OpenAI initialization failed: {e}")
+    import orjson  # optional: faster JSON codec for prompt payloads and AI replies
+except ImportError:
+    orjson = None
 
-# Initialize DSPy for structured outputs
-DSPY_AVAILABLE = False
 try:
-    from dspy_signatures import (
-        initialize_dspy,
-        ShiftPlannerModule,
-        AvailabilityAnalyzerModule,
-        ViolationDetectorModule,
-        SuggestionGeneratorModule,
-        ComprehensiveSchedulerModule,
-        ShiftPerDay,
-        EmployeeAvailability,
-        Violation,
-        Suggestion
+    from pydantic import BaseModel  # optional: schema-constrained (structured output) replies
+except ImportError:
+    BaseModel = None
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> str:
+    """Serialize a prompt payload as UTF-8 text (non-ASCII kept as-is, unknown types via str)."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=str, option=option).decode("utf-8")
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False, default=str)
+
+
+def _json_loads(content: str) -> Any:
+    """Parse a JSON reply; orjson's decode error subclasses json.JSONDecodeError."""
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+
+def _load_reply(content: str, schema=None) -> Any:
+    """Parse a JSON reply; with a pydantic schema, validate it in one pass and return plain data."""
+    if schema is not None:
+        return schema.model_validate_json(content).model_dump()
+    return _json_loads(content)
+
+
+if BaseModel is not None:
+    class _TaskSelection(BaseModel):
+        task: int
+        selected: List[str]
+
+    class _SelectionBatch(BaseModel):
+        results: List[_TaskSelection]
+else:
+    _SelectionBatch = None
+
+
+def _schedule_context(schedule_df: pd.DataFrame) -> str:
+    """
+    Compact JSON for a schedule passed into a prompt: column names once plus row arrays
+    ("split" orient without the index) instead of repeating every key on every record.
+    """
+    if schedule_df is None or schedule_df.empty:
+        return "[]"
+    return schedule_df.to_json(orient="split", index=False, force_ascii=False, date_format="iso")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_client():
+    """
+    Build the OpenAI client on first use so importing this module (e.g. via scheduler)
+    does not pull in the openai package or set up an HTTP client.
+    Returns None when no API key is configured or initialization fails.
+    """
+    api_key = os.getenv("OpenAI_API_KEY")
+    if not api_key:
+        return None
+    try:
+        from openai import OpenAI
+        return OpenAI(api_key=api_key)
+    except Exception as e:
+        print(f"OpenAI initialization failed: {e}")
+        return None
+
+
+def _complete(
+    system: str,
+    user: str,
+    temperature: float,
+    max_tokens: int,
+    json_mode: bool,
+    model: str,
+    schema=None,
+) -> str:
+    """
+    Run one chat completion and return the message content.
+    With a pydantic `schema` the reply is constrained to it (structured outputs).
+    """
+    if schema is not None:
+        create = _get_client().beta.chat.completions.parse
+        extra = {"response_format": schema}
+    else:
+        create = _get_client().chat.completions.create
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+    response = create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        **extra
     )
-    
-    # Initialize DSPy if API key is available
-    if client:
+    return response.choices[0].message.content
+
+
+# _chat's memo: reply text keyed on the prompt hash plus call options, oldest evicted first.
+# Lock-guarded because _chat_many calls _chat from a thread pool.
+_COMPLETION_CACHE_SIZE = 512
+_completion_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_completion_cache_lock = threading.Lock()
+
+
+def _chat(
+    system: str,
+    user: str,
+    temperature: float,
+    max_tokens: int,
+    json_mode: bool = True,
+    model: str = "gpt-4o-mini",
+    schema=None,
+) -> str:
+    """
+    Chat completion cached per process on the SHA-256 of (model, system prompt, user prompt),
+    so re-sending an identical prompt (re-clicking a button, re-analyzing unchanged data) is
+    answered without a network round trip. Only the hash is kept as the key; errors propagate
+    and are not cached. Sampled calls (temperature > 0) skip the cache, so asking again gives
+    a fresh reply.
+    """
+    if temperature > 0:
+        return _complete(system, user, temperature, max_tokens, json_mode, model, schema)
+    prompt_hash = hashlib.sha256(f"{model}\x1f{system}\x1f{user}".encode("utf-8")).hexdigest()
+    key = (prompt_hash, temperature, max_tokens, json_mode, schema)
+    with _completion_cache_lock:
+        if key in _completion_cache:
+            _completion_cache.move_to_end(key)
+            return _completion_cache[key]
+    reply = _complete(system, user, temperature, max_tokens, json_mode, model, schema)
+    with _completion_cache_lock:
+        _completion_cache[key] = reply
+        if len(_completion_cache) > _COMPLETION_CACHE_SIZE:
+            _completion_cache.popitem(last=False)
+    return reply
+
+
+def _chat_stream(
+    system: str,
+    user: str,
+    temperature: float,
+    max_tokens: int,
+    model: str = "gpt-4o-mini",
+) -> Iterator[str]:
+    """Stream a free-text completion, yielding content deltas as they arrive (not cached)."""
+    response = _get_client().chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+    )
+    for chunk in response:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+# Upper bound on in-flight OpenAI requests issued by _chat_many (keeps us under RPM limits)
+AI_MAX_CONCURRENCY = 8
+
+
+def _chat_many(
+    system: str,
+    users: List[str],
+    temperature: float,
+    max_tokens: int,
+    json_mode: bool = True,
+    schema=None,
+) -> List[Any]:
+    """
+    Run independent _chat calls concurrently so wall time is ~one round trip instead of N.
+    Returns, per prompt and in order, the content string or the exception it raised.
+    """
+    def _one(user: str):
         try:
-            initialize_dspy()
-            DSPY_AVAILABLE = True
-            print("✓ DSPy initialized for structured scheduling")
+            return _chat(system, user, temperature=temperature, max_tokens=max_tokens,
+                         json_mode=json_mode, schema=schema)
         except Exception as e:
-            print(f"DSPy initialization warning: {e}")
-except ImportError as e:
-    print(f"DSPy signatures not available: {e}")
+            return e
 
+    if len(users) <= 1:
+        return [_one(u) for u in users]
+    with ThreadPoolExecutor(max_workers=min(AI_MAX_CONCURRENCY, len(users))) as pool:
+        return list(pool.map(_one, users))
 
-def _shift_len(shift: str) -> int:
-    """Return shift duration in hours."""
-    s, e = SHIFT_TIMES.get(shift, (9, 17))
-    return (24 - s + e) if e < s else (e - s)
+
+# DSPy for structured outputs: imported and initialized on the first structured call rather
+# than at module import (scheduler imports this module, so every app start paid for it).
+@functools.lru_cache(maxsize=1)
+def _dspy():
+    """Return the initialized dspy_signatures module, or None if DSPy is unavailable."""
+    try:
+        import dspy_signatures
+    except ImportError as e:
+        print(f"DSPy signatures not available: {e}")
+        return None
+    # Initialize DSPy if API key is available
+    if not os.getenv("OpenAI_API_KEY"):
+        return None
+    try:
+        dspy_signatures.initialize_dspy()
+        print("✓ DSPy initialized for structured scheduling")
+        return dspy_signatures
+    except Exception as e:
+        print(f"DSPy initialization warning: {e}")
+        return None
+
+
+def __getattr__(name: str):
+    # Keep `from ai_scheduler import DSPY_AVAILABLE` working; it now resolves lazily
+    if name == "DSPY_AVAILABLE":
+        return _dspy() is not None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def analyze_schedule_with_ai(
@@ -75,6 +260,7 @@ def analyze_schedule_with_ai(
     - predicted_conflicts: Potential scheduling conflicts
     - recommended_actions: Actions to improve the schedule
     """
+    client = _get_client()
     if not client:
         return {
             "error": "OpenAI API not configured",
@@ -114,10 +300,10 @@ SHIFTS: {', '.join(active_shifts)}
 ROLES: {', '.join(roles)}
 
 EMPLOYEES:
-{json.dumps(employee_summary, indent=2)}
+{_json_dumps(employee_summary, indent=True)}
 
 ROLE REQUIREMENTS:
-{json.dumps(role_summary, indent=2)}
+{_json_dumps(role_summary, indent=True)}
 
 RULES:
 - Max daily hours: {rules.get('max_daily_hours_5days', 8)}h
@@ -141,18 +327,14 @@ Format your response as JSON with these keys:
   "coverage_score": 0-100
 }}"""
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are an expert workforce scheduling analyst. Provide concise, actionable insights in JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
+        content = _chat(
+            "You are an expert workforce scheduling analyst. Provide concise, actionable insights in JSON format.",
+            prompt,
+            temperature=0,
             max_tokens=1000,
-            response_format={"type": "json_object"}
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = _json_loads(content)
         return result
         
     except Exception as e:
@@ -166,6 +348,17 @@ Format your response as JSON with these keys:
         }
 
 
+# Static instructions go first (system message) and per-request data last, so repeated
+# calls share a long identical prefix that OpenAI's automatic prompt caching can reuse.
+_SELECTION_SYSTEM = """You are a fair and efficient workforce scheduler. Select employees to balance workload. Reply with a JSON object.
+
+Prioritize:
+1. Workload balance (prefer employees with fewer hours)
+2. Fairness (distribute shifts evenly)
+3. Avoiding burnout (don't overload anyone)
+4. Role expertise (if roles list indicates specialization)"""
+
+
 def optimize_employee_assignments_with_ai(
     date: dt.date,
     shift: str,
@@ -180,69 +373,56 @@ def optimize_employee_assignments_with_ai(
     
     Returns list of employee names in priority order.
     """
-    if not client or not available_employees:
-        # Fallback: simple load-based sorting
+    client = _get_client()
+    if not client or len(available_employees) <= 1:
+        # Fallback: simple load-based sorting (a single candidate needs no model call)
         return [e["name"] for e in available_employees[:3]]
     
     try:
-        # Compute workload for each employee
-        employee_stats = []
-        for emp in available_employees:
-            name = emp["name"]
-            emp_sched = current_schedule[current_schedule["Υπάλληλος"] == name]
-            
-            day_hours = emp_sched[emp_sched["Ημερομηνία"] == str(date)]["Ώρες"].sum() if not emp_sched.empty else 0
-            
-            week = date.isocalendar().week
-            week_hours = 0
-            for _, row in emp_sched.iterrows():
-                row_date = pd.to_datetime(row["Ημερομηνία"]).date()
-                if row_date.isocalendar().week == week:
-                    week_hours += row["Ώρες"]
-            
-            employee_stats.append({
-                "name": name,
-                "roles": emp.get("roles", []),
-                "day_hours": int(day_hours),
-                "week_hours": int(week_hours),
-                "total_shifts": len(emp_sched)
-            })
-        
-        prompt = f"""Select the best employee(s) for this shift assignment:
+        # Compute workload for each employee: one grouped pass over the schedule, then lookups
+        day_hours_by, week_hours_by, shifts_by = {}, {}, {}
+        if not current_schedule.empty:
+            names = current_schedule["Υπάλληλος"]
+            hours = current_schedule["Ώρες"]
+            on_day = current_schedule["Ημερομηνία"] == str(date)
+            in_week = pd.to_datetime(current_schedule["Ημερομηνία"]).dt.isocalendar().week == date.isocalendar().week
+            day_hours_by = hours[on_day].groupby(names[on_day]).sum().to_dict()
+            week_hours_by = hours[in_week].groupby(names[in_week]).sum().to_dict()
+            shifts_by = names.value_counts().to_dict()
 
-DATE: {date.strftime('%Y-%m-%d')} ({DAYS[date.weekday()]})
-SHIFT: {shift}
-ROLE: {role}
-WORK MODEL: {work_model}
-
-AVAILABLE EMPLOYEES:
-{json.dumps(employee_stats, indent=2)}
+        employee_stats = [{
+            "name": emp["name"],
+            "roles": emp.get("roles", []),
+            "day_hours": int(day_hours_by.get(emp["name"], 0)),
+            "week_hours": int(week_hours_by.get(emp["name"], 0)),
+            "total_shifts": int(shifts_by.get(emp["name"], 0)),
+        } for emp in available_employees]
+        
+        prompt = f"""WORK MODEL: {work_model}
 
 CONSTRAINTS:
 - Max daily hours: {rules.get('max_daily_hours_5days', 8)}h
 - Weekly hours cap: {rules.get('weekly_hours_5days', 40)}h
 - Shift duration: {_shift_len(shift)}h
 
-Select 1-3 employees prioritizing:
-1. Workload balance (prefer employees with fewer hours)
-2. Fairness (distribute shifts evenly)
-3. Avoiding burnout (don't overload anyone)
-4. Role expertise (if roles list indicates specialization)
+DATE: {date.strftime('%Y-%m-%d')} ({DAYS[date.weekday()]})
+SHIFT: {shift}
+ROLE: {role}
+
+AVAILABLE EMPLOYEES:
+{_json_dumps(employee_stats, indent=True)}"""
 
-Return JSON: {{"selected": ["name1", "name2", ...], "reasoning": "brief explanation"}}"""
+        content = _chat(
+            _SELECTION_SYSTEM + """
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a fair and efficient workforce scheduler. Select employees to balance workload."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
+Select 1-3 employees for the shift assignment.
+Return JSON: {"selected": ["name1", "name2", ...], "reasoning": "brief explanation"}""",
+            prompt,
+            temperature=0,
             max_tokens=200,
-            response_format={"type": "json_object"}
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = _json_loads(content)
         return result.get("selected", [available_employees[0]["name"]])
         
     except Exception as e:
@@ -251,6 +431,127 @@ Return JSON: {{"selected": ["name1", "name2", ...], "reasoning": "brief explanat
         return [available_employees[0]["name"]]
 
 
+def _dominant_candidate(candidates: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Name of the candidate whose day hours, week hours and shift count are all no higher
+    than everyone else's (and strictly lower on at least one metric per rival), else None.
+    Workload balance is the first selection criterion, so such a task has a clear answer.
+    """
+    keys = ("day_hours", "week_hours", "total_shifts")
+    loads = [tuple(c.get(k, 0) for k in keys) for c in candidates]
+    if not loads:
+        return None
+    best = min(range(len(loads)), key=lambda i: loads[i])
+    for i, load in enumerate(loads):
+        if i == best:
+            continue
+        if load == loads[best] or any(b > o for b, o in zip(loads[best], load)):
+            return None
+    return candidates[best]["name"]
+
+
+def optimize_employee_assignments_batch_with_ai(
+    tasks: List[Dict[str, Any]],
+    rules: Dict,
+    work_model: str = "5ήμερο",
+    chunk_size: int = 20
+) -> List[List[str]]:
+    """
+    Batched variant of optimize_employee_assignments_with_ai.
+
+    Each task is {"date": "YYYY-MM-DD", "shift": str, "role": str,
+    "candidates": [{"name", "roles", "day_hours", "week_hours", "total_shifts"}, ...]}.
+    Tasks are sent `chunk_size` per request and the chunks are issued concurrently.
+
+    Returns one list of employee names (priority order) per task, aligned with `tasks`.
+    An empty list means "no AI preference" and callers should use their own ranking.
+    """
+    if not tasks:
+        return []
+    client = _get_client()
+    if not client:
+        return [[] for _ in tasks]
+
+    # Deterministic fast path: tasks with a clearly least-loaded candidate skip the model
+    ranked: List[List[str]] = [[] for _ in tasks]
+    pending = []
+    for i, t in enumerate(tasks):
+        best = _dominant_candidate(t["candidates"])
+        if best is not None:
+            ranked[i] = [best]
+        else:
+            pending.append(i)
+    if not pending:
+        return ranked
+
+    payload = [
+        {
+            "task": j,
+            "date": tasks[i]["date"],
+            "shift": tasks[i]["shift"],
+            "role": tasks[i]["role"],
+            "shift_hours": _shift_len(tasks[i]["shift"]),
+            "candidates": tasks[i]["candidates"],
+        }
+        for j, i in enumerate(pending)
+    ]
+    chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), max(1, chunk_size))]
+
+    prompts = [f"""WORK MODEL: {work_model}
+
+CONSTRAINTS:
+- Max daily hours: {rules.get('max_daily_hours_5days', 8)}h
+- Weekly hours cap: {rules.get('weekly_hours_5days', 40)}h
+
+TASKS:
+{_json_dumps(chunk)}""" for chunk in chunks]
+
+    contents = _chat_many(
+        _SELECTION_SYSTEM + """
+
+For every task select 1-3 of its candidates.
+Return JSON: {"results": [{"task": 0, "selected": ["name1", "name2", ...]}, ...]}""",
+        prompts,
+        temperature=0,
+        max_tokens=min(4000, 60 * chunk_size + 100),
+        schema=_SelectionBatch,
+    )
+
+    for content in contents:
+        try:
+            if isinstance(content, Exception):
+                raise content
+            for item in _load_reply(content, _SelectionBatch).get("results", []):
+                idx = item.get("task")
+                if isinstance(idx, int) and 0 <= idx < len(pending):
+                    ranked[pending[idx]] = [str(n) for n in item.get("selected", [])]
+        except Exception as e:
+            print(f"AI batch employee selection error: {e}")
+    return ranked
+
+
+_CONFLICTS_SYSTEM = """You are an expert at resolving workforce scheduling conflicts. Provide specific, actionable fixes as a JSON object.
+
+Analyze the scheduling violations you are given and suggest specific actions to resolve them:
+1. Employee swaps (who can switch with whom)
+2. Shift removals (which assignments to delete)
+3. Alternative assignments (better shift/role combinations)
+
+Return JSON:
+{
+  "suggested_swaps": [
+    {"employee1": "name", "employee2": "name", "date": "YYYY-MM-DD", "shift": "shift", "reason": "why"}
+  ],
+  "suggested_removals": [
+    {"employee": "name", "date": "YYYY-MM-DD", "shift": "shift", "reason": "why"}
+  ],
+  "alternative_assignments": [
+    {"employee": "name", "date": "YYYY-MM-DD", "shift": "shift", "role": "role", "reason": "why"}
+  ],
+  "priority_fixes": ["action1", "action2"]
+}"""
+
+
 def resolve_conflicts_with_ai(
     violations_df: pd.DataFrame,
     schedule_df: pd.DataFrame,
@@ -267,6 +568,7 @@ def resolve_conflicts_with_ai(
     - suggested_removals: Shifts to remove to fix violations
     - alternative_assignments: Better assignment suggestions
     """
+    client = _get_client()
     if not client or violations_df.empty:
         return {
             "suggested_swaps": [],
@@ -278,50 +580,25 @@ def resolve_conflicts_with_ai(
         # Summarize violations
         violation_summary = violations_df.groupby(["Rule", "Severity"]).size().reset_index(name="count")
         
-        top_violations = violations_df.head(10).to_dict('records')
+        top_violations = violations_df.head(10).to_json(orient="records", force_ascii=False, date_format="iso", indent=2)
         
-        prompt = f"""Analyze these scheduling violations and suggest fixes:
+        prompt = f"""AVAILABLE SHIFTS: {', '.join(active_shifts)}
+AVAILABLE ROLES: {', '.join(roles)}
 
 VIOLATION SUMMARY:
 {violation_summary.to_string()}
 
 TOP VIOLATIONS:
-{json.dumps(top_violations, indent=2, default=str)}
+{top_violations}"""
 
-AVAILABLE SHIFTS: {', '.join(active_shifts)}
-AVAILABLE ROLES: {', '.join(roles)}
-
-Suggest specific actions to resolve violations:
-1. Employee swaps (who can switch with whom)
-2. Shift removals (which assignments to delete)
-3. Alternative assignments (better shift/role combinations)
-
-Return JSON:
-{{
-  "suggested_swaps": [
-    {{"employee1": "name", "employee2": "name", "date": "YYYY-MM-DD", "shift": "shift", "reason": "why"}}
-  ],
-  "suggested_removals": [
-    {{"employee": "name", "date": "YYYY-MM-DD", "shift": "shift", "reason": "why"}}
-  ],
-  "alternative_assignments": [
-    {{"employee": "name", "date": "YYYY-MM-DD", "shift": "shift", "role": "role", "reason": "why"}}
-  ],
-  "priority_fixes": ["action1", "action2"]
-}}"""
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are an expert at resolving workforce scheduling conflicts. Provide specific, actionable fixes."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
+        content = _chat(
+            _CONFLICTS_SYSTEM,
+            prompt,
+            temperature=0,
             max_tokens=800,
-            response_format={"type": "json_object"}
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = _json_loads(content)
         return result
         
     except Exception as e:
@@ -348,26 +625,47 @@ def get_ai_scheduling_advice(
     Returns:
         AI response as string
     """
+    client = _get_client()
     if not client:
         return "AI assistant not available. Please configure OpenAI API key."
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful workforce scheduling expert. Provide practical, actionable advice."},
-                {"role": "user", "content": f"Context: {context}\n\nQuestion: {question}"}
-            ],
+        return _chat(
+            "You are a helpful workforce scheduling expert. Provide practical, actionable advice.",
+            f"Context: {context}\n\nQuestion: {question}",
             temperature=0.7,
-            max_tokens=300
+            max_tokens=300,
+            json_mode=False,
         )
         
-        return response.choices[0].message.content
-        
     except Exception as e:
         return f"Error getting AI advice: {str(e)}"
 
 
+def stream_ai_scheduling_advice(
+    context: str,
+    question: str
+) -> Iterator[str]:
+    """
+    Streaming variant of get_ai_scheduling_advice for st.write_stream: yields the
+    answer text as the model generates it, so the first words show up immediately.
+    """
+    client = _get_client()
+    if not client:
+        yield "AI assistant not available. Please configure OpenAI API key."
+        return
+
+    try:
+        yield from _chat_stream(
+            "You are a helpful workforce scheduling expert. Provide practical, actionable advice.",
+            f"Context: {context}\n\nQuestion: {question}",
+            temperature=0.7,
+            max_tokens=300,
+        )
+    except Exception as e:
+        yield f"Error getting AI advice: {str(e)}"
+
+
 # ============================================================================
 # DSPy-based Structured Functions
 # ============================================================================
@@ -396,11 +694,12 @@ def get_shifts_per_day_structured(
     Returns:
         List of dicts with shifts per day (structured output)
     """
-    if not DSPY_AVAILABLE:
+    sigs = _dspy()
+    if sigs is None:
         return _fallback_shifts_per_day(start_date, days_count, active_shifts, roles, role_requirements)
     
     try:
-        planner = ShiftPlannerModule()
+        planner = sigs.ShiftPlannerModule()
         
         result = planner.forward(
             business_model=business_model,
@@ -441,14 +740,14 @@ def get_employee_availability_structured(
     Returns:
         List of dicts with employee availability (structured output)
     """
-    if not DSPY_AVAILABLE:
+    sigs = _dspy()
+    if sigs is None:
         return _fallback_employee_availability(employees, current_schedule, work_rules)
     
     try:
-        analyzer = AvailabilityAnalyzerModule()
+        analyzer = sigs.AvailabilityAnalyzerModule()
         
-        # Convert DataFrame to JSON if needed
-        schedule_json = current_schedule.to_json(orient='records') if not current_schedule.empty else "[]"
+        schedule_json = _schedule_context(current_schedule)
         
         result = analyzer.forward(
             employees_data=json.dumps(employees),
@@ -487,13 +786,14 @@ def get_violations_structured(
     Returns:
         List of Violation dicts (structured output)
     """
-    if not DSPY_AVAILABLE:
+    sigs = _dspy()
+    if sigs is None:
         return _fallback_violations(schedule_df, work_rules)
     
     try:
-        detector = ViolationDetectorModule()
+        detector = sigs.ViolationDetectorModule()
         
-        schedule_json = schedule_df.to_json(orient='records') if not schedule_df.empty else "[]"
+        schedule_json = _schedule_context(schedule_df)
         
         result = detector.forward(
             schedule_data=schedule_json,
@@ -534,13 +834,14 @@ def get_suggestions_structured(
     Returns:
         List of Suggestion dicts (structured output)
     """
-    if not DSPY_AVAILABLE:
+    sigs = _dspy()
+    if sigs is None:
         return _fallback_suggestions(violations, employees)
     
     try:
-        generator = SuggestionGeneratorModule()
+        generator = sigs.SuggestionGeneratorModule()
         
-        schedule_json = schedule_df.to_json(orient='records') if not schedule_df.empty else "[]"
+        schedule_json = _schedule_context(schedule_df)
         
         result = generator.forward(
             schedule_data=schedule_json,
@@ -586,15 +887,16 @@ def get_comprehensive_analysis_structured(
     Returns:
         Dict with all four structured outputs plus overall score
     """
-    if not DSPY_AVAILABLE:
+    sigs = _dspy()
+    if sigs is None:
         return _fallback_comprehensive_analysis(
             employees, schedule_params, current_schedule, work_rules
         )
     
     try:
-        scheduler = ComprehensiveSchedulerModule()
+        scheduler = sigs.ComprehensiveSchedulerModule()
         
-        schedule_json = current_schedule.to_json(orient='records') if not current_schedule.empty else "[]"
+        schedule_json = _schedule_context(current_schedule)
         
         result = scheduler.forward(
             business_context=json.dumps(business_settings),
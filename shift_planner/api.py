@@ -24,9 +24,13 @@ from pathlib import Path
 from contextlib import asynccontextmanager
 sys.path.insert(0, str(Path(__file__).parent))
 
+from constants import configure_logging
+
+configure_logging()
+
 from db import (
     init_db,
-    get_all_companies, get_company, create_company, update_company,
+    get_all_companies, get_company, get_company_fields, create_company, update_company,
     get_employees, add_employee, update_employee, delete_employee,
     get_schedule_range, bulk_save_week_schedule
 )
@@ -171,7 +175,7 @@ async def create_new_company(company: CompanyCreate):
 @app.patch("/api/companies/{company_id}")
 async def update_company_settings(company_id: int, updates: CompanyUpdate):
     """Update company settings"""
-    company = get_company(company_id)
+    company = get_company_fields(company_id, fields=("id",))
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
@@ -188,7 +192,7 @@ async def update_company_settings(company_id: int, updates: CompanyUpdate):
 @app.get("/api/companies/{company_id}/employees")
 async def list_employees(company_id: int):
     """Get all employees for a company"""
-    company = get_company(company_id)
+    company = get_company_fields(company_id, fields=("id",))
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
@@ -199,7 +203,7 @@ async def list_employees(company_id: int):
 @app.post("/api/companies/{company_id}/employees")
 async def create_employee(company_id: int, employee: EmployeeCreate):
     """Add a new employee"""
-    company = get_company(company_id)
+    company = get_company_fields(company_id, fields=("id",))
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
@@ -283,7 +287,7 @@ async def generate_schedule(request: ScheduleGenerateRequest):
 @app.get("/api/schedule/{company_id}")
 async def get_schedule(company_id: int, start_date: str, end_date: str):
     """Get schedule for a date range"""
-    company = get_company(company_id)
+    company = get_company_fields(company_id, fields=("id",))
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
@@ -294,7 +298,7 @@ async def get_schedule(company_id: int, start_date: str, end_date: str):
 @app.post("/api/schedule/save")
 async def save_schedule(request: ScheduleSaveRequest):
     """Save schedule assignments"""
-    company = get_company(request.company_id)
+    company = get_company_fields(request.company_id, fields=("id",))
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
@@ -306,7 +310,7 @@ async def save_schedule(request: ScheduleSaveRequest):
 @app.post("/api/schedule/analyze")
 async def analyze_schedule(company_id: int, schedule: List[Dict[str, Any]]):
     """Analyze a schedule for violations"""
-    company = get_company(company_id)
+    company = get_company_fields(company_id, fields=("rules",))
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
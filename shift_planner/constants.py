@@ -1,29 +1,54 @@
 # -*- coding: utf-8 -*-
+from dataclasses import dataclass
 from datetime import datetime, timedelta, time
-from typing import Optional
+from types import MappingProxyType
+from typing import Optional, Tuple
 import os
 import logging, sys
 
 # ---------- Logging ----------
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
-logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL, logging.INFO),
-    format="%(asctime)s %(levelname)s %(name)s %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
 logger = logging.getLogger("shift_planner")
 
+
+def configure_logging() -> None:
+    """Send logs to stdout; called by the entry points (main.py, api.py), not on import."""
+    logging.basicConfig(
+        level=getattr(logging, LOG_LEVEL, logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+
 # ---------- App Config ----------
-APP_ENV = os.getenv("APP_ENV", "dev").lower()  # dev|prod
-DB_FILE = os.getenv("DB_FILE", "shifts.db")
-SERVER_PORT = int(os.getenv("SERVER_PORT", "8501"))
-SESSION_TTL_MIN = int(os.getenv("SESSION_TTL_MIN", "240"))
-TZ = os.getenv("TZ", "Europe/Athens")
+@dataclass(frozen=True, slots=True)
+class AppConfig:
+    app_env: str  # dev|prod
+    db_file: str
+    server_port: int
+    session_ttl_min: int
+    tz: str
+
+
+# Environment is read and parsed once per process; the names below are aliases
+CONFIG = AppConfig(
+    app_env=os.getenv("APP_ENV", "dev").lower(),
+    db_file=os.getenv("DB_FILE", "shifts.db"),
+    server_port=int(os.getenv("SERVER_PORT", "8501")),
+    session_ttl_min=int(os.getenv("SESSION_TTL_MIN", "240")),
+    tz=os.getenv("TZ", "Europe/Athens"),
+)
+APP_ENV = CONFIG.app_env
+DB_FILE = CONFIG.db_file
+SERVER_PORT = CONFIG.server_port
+SESSION_TTL_MIN = CONFIG.session_ttl_min
+TZ = CONFIG.tz
 
 # ---------- Domain Constants ----------
-DAYS = ["Δευτέρα", "Τρίτη", "Τετάρτη", "Πέμπτη", "Παρασκευή", "Σάββατο", "Κυριακή"]
+# Immutable and interned: label comparisons in the schedulers hit the identity fast path
+DAYS = tuple(map(sys.intern, ["Δευτέρα", "Τρίτη", "Τετάρτη", "Πέμπτη", "Παρασκευή", "Σάββατο", "Κυριακή"]))
 
-ALL_SHIFTS = ["Πρωί", "Απόγευμα", "Βράδυ"]
+ALL_SHIFTS = tuple(map(sys.intern, ["Πρωί", "Απόγευμα", "Βράδυ"]))
 
 SHIFT_TIMES = {
     "Πρωί": (8, 16),
@@ -31,11 +56,23 @@ SHIFT_TIMES = {
     "Βράδυ": (23, 7)  # wraps to next day
 }
 
-DEFAULT_ROLES = ["Ταμείο", "Σερβιτόρος", "Μάγειρας", "Barista"]
+# Immutable set of labels with defined hours; is_known_shift is its C-level membership test
+KNOWN_SHIFTS = frozenset(SHIFT_TIMES)
+is_known_shift = KNOWN_SHIFTS.__contains__
+
+# Durations are fixed per label: compute them once here instead of on every lookup
+_SHIFT_DURATION = {k: (24 - s + e) if e < s else (e - s) for k, (s, e) in SHIFT_TIMES.items()}
+# (end hour, wraps past midnight) per label, for shift_end_datetime
+_SHIFT_END = {k: (e, e < s) for k, (s, e) in SHIFT_TIMES.items()}
+_ONE_DAY = timedelta(days=1)
+
+DEFAULT_ROLES = tuple(map(sys.intern, ["Ταμείο", "Σερβιτόρος", "Μάγειρας", "Barista"]))
 
 EXTRA_ROLES = ["Υποδοχή", "Καθαριστής", "Λαντζέρης", "Οδηγός", "Manager"]
 
-DEFAULT_RULES = {
+# Read-only view: every company starts from DEFAULT_RULES.copy(), so a stray write
+# here would leak into all of them. The proxy costs nothing on reads.
+_DEFAULT_RULES = {
     "max_daily_hours_5days": 8,
     "max_daily_hours_6days": 9,
     "max_daily_hours_7days": 9,
@@ -49,6 +86,18 @@ DEFAULT_RULES = {
     "max_consecutive_days": 6,
     "work_model": "5ήμερο",
 }
+DEFAULT_RULES = MappingProxyType(_DEFAULT_RULES)
+
+# Per work model: (daily-hours rule key, default, weekly-hours rule key, default).
+# Defaults come from DEFAULT_RULES so the numbers live in exactly one place.
+_MODEL_HOUR_RULES = {
+    model: (daily_key, DEFAULT_RULES[daily_key], weekly_key, DEFAULT_RULES[weekly_key])
+    for model, (daily_key, weekly_key) in {
+        "5ήμερο": ("max_daily_hours_5days", "weekly_hours_5days"),
+        "6ήμερο": ("max_daily_hours_6days", "weekly_hours_6days"),
+        "7ήμερο": ("max_daily_hours_7days", "weekly_hours_7days"),
+    }.items()
+}
 
 
 # ---------- Utility Functions ----------
@@ -56,33 +105,65 @@ def shift_duration(shift: str) -> Optional[int]:
     """Return duration in hours, handling wrap-around shifts.
     Returns None if shift label is not in SHIFT_TIMES.
     """
-    times = SHIFT_TIMES.get(shift)
-    if not times:
+    if not is_known_shift(shift):
         logger.info(f"Ignoring unknown shift label '{shift}'.")
         return None
-    s, e = times
-    return (24 - s + e) if e < s else (e - s)
+    return _SHIFT_DURATION[shift]
+
 
+def shift_hours(shift: str) -> int:
+    """Like shift_duration, but unknown labels count as a default 09:00–17:00 shift."""
+    return _SHIFT_DURATION.get(shift, 8)
 
 
 def shift_end_datetime(d: datetime, shift: str) -> Optional[datetime]:
     """Compute end datetime for a shift that may cross midnight.
     Returns None if shift label is unknown.
     """
-    times = SHIFT_TIMES.get(shift)
-    if not times:
+    end = _SHIFT_END.get(shift)
+    if end is None:
         logger.warning(f"Unknown shift label '{shift}' – returning None.")
         return None
 
-    s, e = times
+    e, wraps = end
+    end_dt = datetime(d.year, d.month, d.day, e, 0)
     # If end < start, the shift wraps past midnight → next day
-    end_date = d + timedelta(days=1) if e < s else d
-    return datetime(end_date.year, end_date.month, end_date.day, e, 0)
-
-
+    return end_dt + _ONE_DAY if wraps else end_dt
 
 
 # Helper for rules
 def get_rule(key: str, default=None):
     """Safe access to DEFAULT_RULES with optional fallback."""
     return DEFAULT_RULES.get(key, default)
+
+
+def hour_caps(rules: dict, work_model: str) -> Tuple[int, int]:
+    """(max daily hours, weekly hours cap) for a work model, read from a company's rules."""
+    # Unknown/blank models are treated as 7ήμερο, as the schedulers always did
+    daily_key, daily_default, weekly_key, weekly_default = _MODEL_HOUR_RULES.get(
+        (work_model or "").strip(), _MODEL_HOUR_RULES["7ήμερο"]
+    )
+    return int(rules.get(daily_key, daily_default)), int(rules.get(weekly_key, weekly_default))
+
+
+@dataclass(frozen=True, slots=True)
+class LaborRules:
+    max_daily_hours: int
+    weekly_hours: int
+    min_daily_rest: int
+    max_consecutive_days: int
+    monthly_hours: int
+    work_model: str
+
+
+def labor_rules(rules: dict, work_model: str) -> LaborRules:
+    """A company's rules resolved for one work model, as typed fields read once per run."""
+    max_daily, weekly_cap = hour_caps(rules, work_model)
+    return LaborRules(
+        max_daily_hours=max_daily,
+        weekly_hours=weekly_cap,
+        min_daily_rest=int(rules.get("min_daily_rest", DEFAULT_RULES["min_daily_rest"])),
+        max_consecutive_days=int(rules.get("max_consecutive_days", DEFAULT_RULES["max_consecutive_days"])),
+        monthly_hours=int(rules.get("monthly_hours", DEFAULT_RULES["monthly_hours"])),
+        work_model=work_model,
+    )
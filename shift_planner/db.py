@@ -1,13 +1,34 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import atexit
+import functools
+import itertools
 import sqlite3
 import json
+import threading
+import time
 from contextlib import contextmanager
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, Iterator
 
 from constants import DB_FILE
 
+try:
+    import orjson  # optional: C JSON codec for the per-row roles/availability/settings columns
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(obj: Any) -> str:
+    """Serialize a column value as compact UTF-8 text (non-ASCII kept as-is, same output either way)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
 def _safe_json_loads(s: Optional[str], default):
     """
     Defensive JSON loader for legacy/malformed values.
@@ -16,7 +37,7 @@ def _safe_json_loads(s: Optional[str], default):
     if s is None:
         return default
     try:
-        return json.loads(s)
+        return _json_loads(s)
     except Exception:
         return default
 
@@ -44,27 +65,285 @@ def _ensure_availability(x):
     return []
 
 
+@functools.lru_cache(maxsize=1024)
+def _json_list_cached(raw: Optional[str]) -> Tuple[Any, ...]:
+    """
+    Decode a JSON list column (roles, active_shifts) keyed by its raw text. The same
+    few strings repeat on every row of a week view, so each is parsed once per process.
+    Cached as a tuple: callers take list(...) so no one can mutate the shared value.
+    """
+    return tuple(_ensure_list(_safe_json_loads(raw, [])))
+
+
 # ---------------- Connection Helper ---------------- #
+# Per-connection settings, applied in one round trip when a pooled connection is
+# created (never per get_conn() call). journal_mode persists in the file, so it is
+# only switched when the file is not in WAL yet.
+_CONN_PRAGMAS = """
+    PRAGMA synchronous = NORMAL;
+    PRAGMA busy_timeout = 30000;
+    PRAGMA cache_size = -65536;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA foreign_keys = ON;
+    PRAGMA mmap_size = 268435456;
+"""
+
+
+# One long-lived connection per thread and role (sqlite3 connections are not shareable
+# across threads by default). Reusing them skips the open/close, PRAGMA setup and cold
+# page cache that a fresh connect pays on every call. With WAL, readers never wait on
+# the writer, so reads get their own query-only connection; writes from this process
+# are serialized on one lock instead of racing for SQLite's write lock.
+_local = threading.local()
+_write_lock = threading.RLock()
+# Every pooled connection, whichever thread opened it (Streamlit script runners, the
+# FastAPI threadpool), so the exit hook can close them all, not just the main thread's
+_open_conns: set = set()
+_open_conns_lock = threading.Lock()
+# Long-running servers rarely exit cleanly, so the writer also refreshes planner stats
+# after a commit at most this often rather than only when its connection is closed
+_OPTIMIZE_INTERVAL_S = 3600.0
+_last_optimize = 0.0
+
+
+def _connect(read_only: bool = False) -> sqlite3.Connection:
+    # Autocommit at the driver level: get_conn() opens/closes write transactions itself.
+    # check_same_thread=False only so the exit hook may close it; in normal use each
+    # connection is still touched by its own thread alone.
+    conn = sqlite3.connect(DB_FILE, isolation_level=None, cached_statements=256,
+                           check_same_thread=False)
+    if conn.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+        conn.execute("PRAGMA journal_mode = WAL;")
+    conn.executescript(_CONN_PRAGMAS + ("PRAGMA query_only = ON;" if read_only else ""))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _thread_conn(read_only: bool = False) -> sqlite3.Connection:
+    attr = "reader" if read_only else "writer"
+    conn = getattr(_local, attr, None)
+    # Reconnect if DB_FILE was repointed (tests, multi-tenant tooling)
+    if conn is None or getattr(_local, attr + "_path", None) != DB_FILE:
+        if conn is not None:
+            _close(conn)
+        conn = _connect(read_only)
+        with _open_conns_lock:
+            _open_conns.add(conn)
+        setattr(_local, attr, conn)
+        setattr(_local, attr + "_path", DB_FILE)
+    return conn
+
+
+def _close(conn: sqlite3.Connection) -> None:
+    """
+    Close one pooled connection. It runs PRAGMA optimize first, as SQLite recommends, so
+    planner statistics follow the data as it grows: only tables this connection queried
+    and whose stats are missing or stale get re-analyzed, so it is cheap when nothing changed.
+    """
+    with _open_conns_lock:
+        if conn not in _open_conns:
+            return  # already closed (e.g. by the exit hook)
+        _open_conns.discard(conn)
+    try:
+        with _write_lock:
+            # The reader is query_only, which would block writing sqlite_stat1
+            conn.executescript("PRAGMA query_only = OFF; PRAGMA optimize;")
+    except sqlite3.Error:
+        pass  # best effort; never block shutdown on stats
+    conn.close()
+
+
+def _optimize(conn: sqlite3.Connection, pragma: str = "PRAGMA optimize") -> None:
+    """Refresh stale planner stats on `conn` (caller holds _write_lock); best effort."""
+    global _last_optimize
+    try:
+        conn.execute(pragma)
+    except sqlite3.Error:
+        pass
+    _last_optimize = time.monotonic()
+
+
+def close_conn() -> None:
+    """Close this thread's pooled connections (e.g. at shutdown or in tests)."""
+    for attr in ("writer", "reader"):
+        conn = getattr(_local, attr, None)
+        if conn is not None:
+            setattr(_local, attr, None)
+            _close(conn)
+
+
+def _close_all_conns() -> None:
+    """Close every pooled connection in the process, from any thread."""
+    with _open_conns_lock:
+        conns = list(_open_conns)
+    for conn in conns:
+        try:
+            _close(conn)
+        except sqlite3.Error:
+            pass
+
+
+# On a clean exit, close every thread's connections; closing the last one checkpoints
+# the WAL back into the main file
+atexit.register(_close_all_conns)
+
+
 @contextmanager
 def get_conn():
     """
-    Yields a SQLite connection with sane defaults:
+    Yields this thread's pooled SQLite write connection with sane defaults:
     - Foreign keys ON
-    - WAL journaling
+    - WAL journaling, synchronous=NORMAL (safe with WAL, one fsync per checkpoint)
+    - 30s busy timeout, 64MB page cache, in-memory temp tables, 256MB mmap
     - Row factory -> sqlite3.Row
+    The transaction starts with BEGIN IMMEDIATE, so the write lock is taken up front
+    instead of being upgraded mid-transaction after a SELECT (the SQLITE_BUSY case).
+    Commits on success, rolls back on error; the connection stays open for reuse.
+    A nested get_conn() in the same thread joins the outer transaction.
     """
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute("PRAGMA foreign_keys = ON;")
-    conn.execute("PRAGMA journal_mode = WAL;")
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-        conn.commit()
-    finally:
-        conn.close()
+    with _write_lock:
+        conn = _thread_conn()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        if time.monotonic() - _last_optimize >= _OPTIMIZE_INTERVAL_S:
+            _optimize(conn)
+
+
+def _iter_dicts(conn: sqlite3.Connection, sql: str, params=(),
+                size: int = 500) -> Iterator[Dict[str, Any]]:
+    """
+    Run a SELECT and yield plain dicts keyed by column name (in SELECT order).
+    Pulls raw tuples off the cursor `size` rows at a time (no fetchall() list) and
+    zips them with the column names once, skipping the intermediate sqlite3.Row.
+    """
+    cur = conn.cursor()
+    cur.row_factory = None
+    cur.execute(sql, params)
+    cols = [c[0] for c in cur.description]
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(zip(cols, row))
+
+
+@contextmanager
+def get_read_conn():
+    """
+    Yields this thread's pooled read-only connection (autocommit, query_only).
+    Runs concurrently with the writer under WAL; use it for SELECT-only helpers.
+    """
+    yield _thread_conn(read_only=True)
 
 
 # ---------------- Database Init + Lightweight Migrations ---------------- #
+# Bump whenever the DDL/migrations in init_db() change; stored in PRAGMA user_version
+SCHEMA_VERSION = 2
+
+_INDEXES = (
+    # Enforce uniqueness for schedule (older DBs may lack the constraint)
+    ("idx_schedule_unique",
+     "CREATE UNIQUE INDEX IF NOT EXISTS idx_schedule_unique ON schedule(company_id, employee_id, date, shift)"),
+    # Helpful indexes
+    # Covers get_schedule_range: the (company_id, date) scan also yields employee/shift/role
+    ("idx_sched_company_date_cov",
+     "CREATE INDEX IF NOT EXISTS idx_sched_company_date_cov ON schedule(company_id, date, employee_id, shift, role)"),
+    # Lookups by employee, incl. the ON DELETE CASCADE from employees
+    ("idx_sched_employee_date_shift",
+     "CREATE INDEX IF NOT EXISTS idx_sched_employee_date_shift ON schedule(employee_id, date, shift)"),
+    ("idx_swaps_company_status",
+     "CREATE INDEX IF NOT EXISTS idx_swaps_company_status ON shift_swaps(company_id, status)"),
+)
+
+
+# Base tables, run as one script (one parse pass) inside a single BEGIN IMMEDIATE
+_SCHEMA_DDL = """
+    -- Companies
+    CREATE TABLE IF NOT EXISTS companies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        active_shifts TEXT DEFAULT '[]',
+        roles TEXT DEFAULT '[]',
+        rules TEXT DEFAULT '{}',
+        role_settings TEXT DEFAULT '{}',
+        work_model TEXT DEFAULT '5ήμερο',
+        active INTEGER DEFAULT 1
+    );
+
+    -- Employees
+    CREATE TABLE IF NOT EXISTS employees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        company_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        roles TEXT DEFAULT '[]',
+        availability TEXT DEFAULT '[]',
+        FOREIGN KEY(company_id) REFERENCES companies(id) ON DELETE CASCADE
+    );
+
+    -- Schedule (now includes role)
+    CREATE TABLE IF NOT EXISTS schedule (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        company_id INTEGER NOT NULL,
+        employee_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        shift TEXT NOT NULL,
+        role TEXT DEFAULT NULL,
+        FOREIGN KEY(company_id) REFERENCES companies(id) ON DELETE CASCADE,
+        FOREIGN KEY(employee_id) REFERENCES employees(id) ON DELETE CASCADE
+    );
+
+    -- Shift swap requests
+    CREATE TABLE IF NOT EXISTS shift_swaps (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        company_id INTEGER NOT NULL,
+        requester_id INTEGER NOT NULL,
+        target_employee_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        shift TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending', -- pending|approved|rejected
+        manager_note TEXT DEFAULT NULL,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        FOREIGN KEY(company_id) REFERENCES companies(id) ON DELETE CASCADE,
+        FOREIGN KEY(requester_id) REFERENCES employees(id) ON DELETE CASCADE,
+        FOREIGN KEY(target_employee_id) REFERENCES employees(id) ON DELETE CASCADE
+    );
+"""
+
+
+def _existing_objects(conn: sqlite3.Connection, type_: str) -> set:
+    """Names of all schema objects of one type ('table', 'index', 'trigger', ...)."""
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type=?", (type_,))}
+
+
+def _add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    """
+    ALTER TABLE ... ADD COLUMN inside a savepoint, so a concurrent migration that
+    added the column first only undoes this statement, not the whole init transaction.
+    """
+    cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column in cols:
+        return
+    conn.execute("SAVEPOINT add_column")
+    try:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    except sqlite3.OperationalError as e:
+        conn.execute("ROLLBACK TO add_column")
+        if "duplicate column" not in str(e):
+            conn.execute("RELEASE add_column")
+            raise
+    conn.execute("RELEASE add_column")
+
+
 def init_db():
     """
     Creates base tables if they do not exist.
@@ -73,102 +352,67 @@ def init_db():
       - add schedule.role column if missing
       - enforce uniqueness on schedule via a unique index
       - helpful indexes for speed
+    The base tables go in as one executescript() call, then migrations and indexes
+    run in one get_conn() transaction: two commits in total, not one per statement.
+    Skipped once the file's user_version reaches SCHEMA_VERSION; either way it ends
+    with a PRAGMA optimize pass so planner stats are fresh from startup.
     """
-    with get_conn() as conn:
-        # Companies
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS companies (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            active_shifts TEXT DEFAULT '[]',
-            roles TEXT DEFAULT '[]',
-            rules TEXT DEFAULT '{}',
-            role_settings TEXT DEFAULT '{}',
-            work_model TEXT DEFAULT '5ήμερο',
-            active INTEGER DEFAULT 1
-        )
-        """)
-
-        # Employees
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS employees (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            company_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            roles TEXT DEFAULT '[]',
-            availability TEXT DEFAULT '[]',
-            FOREIGN KEY(company_id) REFERENCES companies(id) ON DELETE CASCADE
-        )
-        """)
-
-        # Schedule (now includes role)
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS schedule (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            company_id INTEGER NOT NULL,
-            employee_id INTEGER NOT NULL,
-            date TEXT NOT NULL,
-            shift TEXT NOT NULL,
-            role TEXT DEFAULT NULL,
-            FOREIGN KEY(company_id) REFERENCES companies(id) ON DELETE CASCADE,
-            FOREIGN KEY(employee_id) REFERENCES employees(id) ON DELETE CASCADE
-        )
-        """)
-
-        # Shift swap requests
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS shift_swaps (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            company_id INTEGER NOT NULL,
-            requester_id INTEGER NOT NULL,
-            target_employee_id INTEGER NOT NULL,
-            date TEXT NOT NULL,
-            shift TEXT NOT NULL,
-            status TEXT NOT NULL DEFAULT 'pending', -- pending|approved|rejected
-            manager_note TEXT DEFAULT NULL,
-            created_at TEXT NOT NULL DEFAULT (datetime('now')),
-            FOREIGN KEY(company_id) REFERENCES companies(id) ON DELETE CASCADE,
-            FOREIGN KEY(requester_id) REFERENCES employees(id) ON DELETE CASCADE,
-            FOREIGN KEY(target_employee_id) REFERENCES employees(id) ON DELETE CASCADE
-        )
-        """)
+    with get_read_conn() as conn:
+        current = conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION
+    if current:
+        with _write_lock:
+            # 0x10002: also check tables this new connection has not queried yet
+            _optimize(_thread_conn(), "PRAGMA optimize=0x10002")
+        return
+
+    # executescript() commits any open transaction first, so the base DDL gets its
+    # own explicit BEGIN IMMEDIATE/COMMIT rather than running inside get_conn()
+    with _write_lock:
+        conn = _thread_conn()
+        try:
+            conn.executescript("BEGIN IMMEDIATE;" + _SCHEMA_DDL + "COMMIT;")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
 
+    with get_conn() as conn:
         # ---------- Lightweight migrations ----------
         # Ensure 'active' exists on companies (older DBs)
-        cols_companies = [r[1] for r in conn.execute("PRAGMA table_info(companies)").fetchall()]
-        if "active" not in cols_companies:
-            conn.execute("ALTER TABLE companies ADD COLUMN active INTEGER DEFAULT 1")
+        _add_column_if_missing(conn, "companies", "active", "INTEGER DEFAULT 1")
 
         # Ensure 'role' exists on schedule (older DBs)
-        cols_sched = [r[1] for r in conn.execute("PRAGMA table_info(schedule)").fetchall()]
-        if "role" not in cols_sched:
-            conn.execute("ALTER TABLE schedule ADD COLUMN role TEXT DEFAULT NULL")
+        _add_column_if_missing(conn, "schedule", "role", "TEXT DEFAULT NULL")
 
-        # Enforce uniqueness for schedule (older DBs may lack the constraint)
-        conn.execute("""
-            CREATE UNIQUE INDEX IF NOT EXISTS idx_schedule_unique
-            ON schedule(company_id, employee_id, date, shift)
-        """)
+        # Indexes: one sqlite_master scan, then only create what is missing
+        existing = _existing_objects(conn, "index")
+        if "idx_sched_company_date" in existing:
+            # Superseded by the covering idx_sched_company_date_cov (schema v2)
+            conn.execute("DROP INDEX idx_sched_company_date")
+        for name, ddl in _INDEXES:
+            if name not in existing:
+                conn.execute(ddl)
+
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
-        # Helpful indexes
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_sched_company_date ON schedule(company_id, date)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_swaps_company_status ON shift_swaps(company_id, status)")
+    with _write_lock:
+        _optimize(_thread_conn(), "PRAGMA optimize=0x10002")
 
 
 # ---------------- Company Functions ---------------- #
 def get_all_companies() -> List[Dict[str, Any]]:
-    with get_conn() as conn:
+    with get_read_conn() as conn:
         rows = conn.execute("SELECT id, name FROM companies ORDER BY name").fetchall()
         return [{"id": r["id"], "name": r["name"]} for r in rows]
 
 
 def get_company(company_id: int) -> Optional[Dict[str, Any]]:
-    with get_conn() as conn:
+    with get_read_conn() as conn:
         r = conn.execute("SELECT * FROM companies WHERE id=?", (company_id,)).fetchone()
         if not r:
             return None
-        active_shifts = _ensure_list(_safe_json_loads(r["active_shifts"], []))
-        roles = _ensure_list(_safe_json_loads(r["roles"], []))
+        active_shifts = list(_json_list_cached(r["active_shifts"]))
+        roles = list(_json_list_cached(r["roles"]))
         rules = _ensure_dict(_safe_json_loads(r["rules"], {}))
         role_settings = _ensure_dict(_safe_json_loads(r["role_settings"], {}))
         return {
@@ -183,6 +427,39 @@ def get_company(company_id: int) -> Optional[Dict[str, Any]]:
         }
 
 
+# Column -> decoder, matching what get_company() returns for that key
+_COMPANY_FIELDS = {
+    "id": lambda v: v,
+    "name": lambda v: v,
+    "active_shifts": lambda v: list(_json_list_cached(v)),
+    "roles": lambda v: list(_json_list_cached(v)),
+    "rules": lambda v: _ensure_dict(_safe_json_loads(v, {})),
+    "role_settings": lambda v: _ensure_dict(_safe_json_loads(v, {})),
+    "work_model": lambda v: v or "5ήμερο",
+    "active": lambda v: v,
+}
+
+
+def get_company_fields(company_id: int, *, fields=None) -> Optional[Dict[str, Any]]:
+    """
+    Like get_company, but only selects and decodes the requested columns, e.g.
+    fields=("id",) for an existence check or ("active_shifts",) for one screen.
+    fields=None returns the full get_company() dict.
+    """
+    if fields is None:
+        return get_company(company_id)
+    unknown = [f for f in fields if f not in _COMPANY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown company fields: {unknown}")
+    with get_read_conn() as conn:
+        r = conn.execute(
+            f"SELECT {', '.join(fields)} FROM companies WHERE id=?", (company_id,)
+        ).fetchone()
+        if not r:
+            return None
+        return {f: _COMPANY_FIELDS[f](r[f]) for f in fields}
+
+
 def create_company(name: str) -> None:
     if not name or not str(name).strip():
         raise ValueError("Company name cannot be empty.")
@@ -194,34 +471,51 @@ def create_company(name: str) -> None:
         )
 
 
+# Column encoders for update_company; only the keys present in `data` are written
+_COMPANY_ENCODERS = {
+    "active_shifts": lambda v: _json_dumps(_ensure_list(v)),
+    "roles": lambda v: _json_dumps(_ensure_list(v)),
+    "rules": lambda v: _json_dumps(_ensure_dict(v)),
+    "role_settings": lambda v: _json_dumps(_ensure_dict(v)),
+    "work_model": lambda v: v,
+    "active": int,
+}
+
+
 def update_company(company_id: int, data: Dict[str, Any]) -> None:
+    """
+    Sparse update: only columns whose keys are in `data` are re-encoded and written,
+    so e.g. toggling `active` does not re-serialize a large role_settings dict.
+    """
     # Guard name NOT NULL and avoid clobbering with None
     with get_conn() as conn:
-        current = conn.execute("SELECT name FROM companies WHERE id=?", (company_id,)).fetchone()
-        if not current:
+        if not conn.execute("SELECT 1 FROM companies WHERE id=?", (company_id,)).fetchone():
             raise ValueError("Company not found.")
-        name_val = data.get("name", current["name"])
-        if name_val is None:
-            name_val = current["name"]
-        name_val = str(name_val).strip()
-        if not name_val:
-            raise ValueError("Company name cannot be empty.")
-
-        active_shifts = json.dumps(_ensure_list(data.get("active_shifts", [])), ensure_ascii=False)
-        roles = json.dumps(_ensure_list(data.get("roles", [])), ensure_ascii=False)
-        rules = json.dumps(_ensure_dict(data.get("rules", {})), ensure_ascii=False)
-        role_settings = json.dumps(_ensure_dict(data.get("role_settings", {})), ensure_ascii=False)
-        work_model = data.get("work_model", "5ήμερο")
-        active = int(data.get("active", 1))
+        sets: Dict[str, Any] = {}
+        if data.get("name") is not None:
+            name_val = str(data["name"]).strip()
+            if not name_val:
+                raise ValueError("Company name cannot be empty.")
+            sets["name"] = name_val
+        for key, encode in _COMPANY_ENCODERS.items():
+            if key in data:
+                sets[key] = encode(data[key])
+        if not sets:
+            return
 
-        conn.execute("""
-            UPDATE companies
-            SET active_shifts=?, roles=?, rules=?, role_settings=?, work_model=?, name=?, active=?
-            WHERE id=?
-        """, (active_shifts, roles, rules, role_settings, work_model, name_val, active, company_id))
+        conn.execute(
+            f"UPDATE companies SET {', '.join(f'{col}=?' for col in sets)} WHERE id=?",
+            (*sets.values(), company_id),
+        )
 
 
 # ---------------- Employee Functions ---------------- #
+# Hot lookups shared by several call sites; one string each keeps one entry in the
+# connection's statement cache (cached_statements=256) instead of near-duplicates.
+_SQL_EMPLOYEE_COMPANY = "SELECT company_id FROM employees WHERE id=?"
+_SQL_EMPLOYEE_ID_BY_NAME = "SELECT id FROM employees WHERE company_id=? AND name=?"
+
+
 def _normalize_roles_for_store(roles) -> List[str]:
     """Accept string or list; return list for storage."""
     if isinstance(roles, str):
@@ -239,13 +533,13 @@ def get_employees(company_id: int) -> List[Dict[str, Any]]:
         availability: {...} or [...]
       }
     """
-    with get_conn() as conn:
+    with get_read_conn() as conn:
         rows = conn.execute(
             "SELECT * FROM employees WHERE company_id=? ORDER BY name", (company_id,)
         ).fetchall()
         out: List[Dict[str, Any]] = []
         for r in rows:
-            roles = _ensure_list(_safe_json_loads(r["roles"], []))
+            roles = list(_json_list_cached(r["roles"]))
             availability = _ensure_availability(_safe_json_loads(r["availability"], []))
             out.append({
                 "id": r["id"],
@@ -272,8 +566,8 @@ def add_employee(company_id: int, name: str, roles, availability) -> None:
             VALUES (?,?,?,?)
         """, (company_id,
               str(name).strip(),
-              json.dumps(roles_list, ensure_ascii=False),
-              json.dumps(availability, ensure_ascii=False)))
+              _json_dumps(roles_list),
+              _json_dumps(availability)))
 
 
 def update_employee(employee_id: int, name: str, roles, availability) -> None:
@@ -287,8 +581,8 @@ def update_employee(employee_id: int, name: str, roles, availability) -> None:
             SET name=?, roles=?, availability=?
             WHERE id=?
         """, (str(name).strip(),
-              json.dumps(roles_list, ensure_ascii=False),
-              json.dumps(availability, ensure_ascii=False),
+              _json_dumps(roles_list),
+              _json_dumps(availability),
               employee_id))
 
 
@@ -298,46 +592,50 @@ def delete_employee(employee_id: int) -> None:
 
 
 # ---------------- Schedule Functions ---------------- #
+# Shared by add_schedule_entry and bulk_save_week_schedule, so both reuse one prepared statement
+_SQL_UPSERT_SCHEDULE = """
+    INSERT INTO schedule (company_id, employee_id, date, shift, role)
+    VALUES (?,?,?,?,?)
+    ON CONFLICT(company_id, employee_id, date, shift) DO UPDATE SET
+        role=excluded.role
+"""
+
+
+
+
 def add_schedule_entry(company_id: int, employee_id: int, date: str, shift: str, role: Optional[str] = None) -> None:
     # Validate FK membership early for better UX
     with get_conn() as conn:
-        emp = conn.execute("SELECT company_id FROM employees WHERE id=?", (employee_id,)).fetchone()
+        emp = conn.execute(_SQL_EMPLOYEE_COMPANY, (employee_id,)).fetchone()
         if not emp:
             raise ValueError("Employee does not exist.")
         if emp["company_id"] != company_id:
             raise ValueError("Employee does not belong to the given company.")
         # Upsert instead of silent ignore: update role if row exists
-        conn.execute("""
-            INSERT INTO schedule (company_id, employee_id, date, shift, role)
-            VALUES (?,?,?,?,?)
-            ON CONFLICT(company_id, employee_id, date, shift) DO UPDATE SET
-                role=excluded.role
-        """, (company_id, employee_id, date, shift, role))
+        conn.execute(_SQL_UPSERT_SCHEDULE, (company_id, employee_id, date, shift, role))
+
+
+_SQL_SCHEDULE = """
+    SELECT s.id, s.date, s.shift, s.role,
+           e.name as employee_name, e.roles
+    FROM schedule s
+    JOIN employees e ON e.id = s.employee_id
+    WHERE s.company_id=?
+    ORDER BY s.date, e.name
+"""
+
+
+def iter_schedule(company_id: int) -> Iterator[Dict[str, Any]]:
+    """Stream all schedule entries for a company (see get_schedule)."""
+    with get_read_conn() as conn:
+        for r in _iter_dicts(conn, _SQL_SCHEDULE, (company_id,)):
+            r["roles"] = list(_json_list_cached(r["roles"]))
+            yield r
 
 
 def get_schedule(company_id: int) -> List[Dict[str, Any]]:
     """Return all schedule entries for a company."""
-    with get_conn() as conn:
-        rows = conn.execute("""
-            SELECT s.id, s.date, s.shift, s.role,
-                   e.name as employee_name, e.roles
-            FROM schedule s
-            JOIN employees e ON e.id = s.employee_id
-            WHERE s.company_id=?
-            ORDER BY s.date, e.name
-        """, (company_id,)).fetchall()
-        result: List[Dict[str, Any]] = []
-        for r in rows:
-            roles = _ensure_list(_safe_json_loads(r["roles"], []))
-            result.append({
-                "id": r["id"],
-                "date": r["date"],
-                "shift": r["shift"],
-                "role": r["role"],
-                "employee_name": r["employee_name"],
-                "roles": roles,
-            })
-        return result
+    return list(iter_schedule(company_id))
 
 
 def clear_schedule(company_id: int) -> None:
@@ -354,46 +652,61 @@ def clear_schedule_range(company_id: int, start_date: str, end_date: str) -> Non
         """, (company_id, start_date, end_date))
 
 
+_SQL_SCHEDULE_RANGE = """
+    SELECT s.id, s.date, s.shift, s.role,
+           e.id as employee_id, e.name as employee_name, e.roles
+    FROM schedule s
+    JOIN employees e ON e.id = s.employee_id
+    WHERE s.company_id=? AND s.date BETWEEN ? AND ?
+    ORDER BY s.date, e.name
+"""
+
+
+def iter_schedule_range(company_id: int, start_date: str, end_date: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream [start_date, end_date] for a company in batches, so long ranges (e.g. a
+    year for reports/exports) never sit in memory twice. Exhaust or close it promptly:
+    the read snapshot stays open while it is suspended.
+    """
+    with get_read_conn() as conn:
+        for r in _iter_dicts(conn, _SQL_SCHEDULE_RANGE, (company_id, start_date, end_date)):
+            r["roles"] = list(_json_list_cached(r["roles"]))
+            yield r
+
+
 def get_schedule_range(company_id: int, start_date: str, end_date: str) -> List[Dict[str, Any]]:
-    with get_conn() as conn:
-        rows = conn.execute("""
-            SELECT s.id, s.date, s.shift, s.role,
-                   e.id as employee_id, e.name as employee_name, e.roles
-            FROM schedule s
-            JOIN employees e ON e.id = s.employee_id
-            WHERE s.company_id=? AND s.date BETWEEN ? AND ?
-            ORDER BY s.date, e.name
-        """, (company_id, start_date, end_date)).fetchall()
-        out: List[Dict[str, Any]] = []
-        for r in rows:
-            roles = _ensure_list(_safe_json_loads(r["roles"], []))
-            out.append({
-                "id": r["id"],
-                "date": r["date"],
-                "shift": r["shift"],
-                "role": r["role"],
-                "employee_id": r["employee_id"],
-                "employee_name": r["employee_name"],
-                "roles": roles,
-            })
-        return out
+    return list(iter_schedule_range(company_id, start_date, end_date))
+
+
+def get_employee_id_map(company_id: int) -> Dict[str, int]:
+    """
+    {name: id} for a whole company in one query. Bulk flows (resolving a generated
+    schedule's names) should use this instead of get_employee_id_by_name per name.
+    On duplicate names the lowest id wins.
+    """
+    with get_read_conn() as conn:
+        return dict(conn.execute(
+            "SELECT name, MIN(id) FROM employees WHERE company_id=? GROUP BY name", (company_id,)
+        ).fetchall())
 
 
 def get_employee_id_by_name(company_id: int, name: str) -> Optional[int]:
-    with get_conn() as conn:
-        row = conn.execute(
-            "SELECT id FROM employees WHERE company_id=? AND name=?",
-            (company_id, name)
-        ).fetchone()
+    with get_read_conn() as conn:
+        row = conn.execute(_SQL_EMPLOYEE_ID_BY_NAME, (company_id, name)).fetchone()
         return row["id"] if row else None
 
 
+# 4 params per row; 200 rows stays under SQLite's 999-variable limit on older builds
+_STAGE_BATCH_ROWS = 200
+
+
 def bulk_save_week_schedule(company_id: int, assignments: List[Dict[str, Any]],
                             start_date: str, end_date: str) -> None:
     """
     assignments: list of {employee_id, date (YYYY-MM-DD), shift, role?}
-    Clears existing rows in [start_date, end_date] for that company, then inserts all.
-    Now deduplicates input and upserts rows (no silent ignore).
+    Makes [start_date, end_date] for that company match `assignments`: rows not in the
+    input are removed, new ones inserted, and unchanged rows are left in place.
+    Deduplicates input and upserts rows (no silent ignore).
     """
     # Normalize and deduplicate input first (last wins on duplicate keys)
     key = lambda a: (a["employee_id"], a["date"], a["shift"])
@@ -405,74 +718,140 @@ def bulk_save_week_schedule(company_id: int, assignments: List[Dict[str, Any]],
         dedup[key(a)] = a  # last write wins
 
     with get_conn() as conn:
-        # Clear the target window
+        # Stage the new week, then apply only the difference: rows that stay put are
+        # neither deleted nor re-inserted, so a re-save of a mostly unchanged week
+        # touches few B-tree pages and writes a small WAL frame set.
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS staged_schedule (
+                employee_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                shift TEXT NOT NULL,
+                role TEXT,
+                PRIMARY KEY (employee_id, date, shift)
+            )
+        """)
+        conn.execute("DELETE FROM staged_schedule")
+        # Multi-row VALUES in fixed-size batches: one statement step per batch instead
+        # of per row; full batches share one cached statement
+        rows = iter(dedup.values())
+        while batch := list(itertools.islice(rows, _STAGE_BATCH_ROWS)):
+            conn.execute(
+                "INSERT INTO staged_schedule VALUES " + ",".join(["(?,?,?,?)"] * len(batch)),
+                [v for a in batch for v in (a["employee_id"], a["date"], a["shift"], a.get("role"))],
+            )
+        # Validate that employees exist & belong to company BEFORE touching schedule:
+        # one set-based statement, no per-id placeholders or Python-side employee map
+        conn.execute("""
+            DELETE FROM staged_schedule
+            WHERE employee_id NOT IN (SELECT id FROM employees WHERE company_id=?)
+        """, (company_id,))
+
+        # Clear rows in the target window that the new week no longer has
         conn.execute("""
             DELETE FROM schedule
             WHERE company_id=? AND date BETWEEN ? AND ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM staged_schedule t
+                  WHERE t.employee_id = schedule.employee_id
+                    AND t.date = schedule.date
+                    AND t.shift = schedule.shift
+              )
         """, (company_id, start_date, end_date))
 
-        # Validate that employees exist & belong to company BEFORE inserting
-        emp_company = {
-            r["id"]: r["company_id"]
-            for r in conn.execute("SELECT id, company_id FROM employees WHERE company_id=?", (company_id,)).fetchall()
-        }
+        # Insert new rows; existing ones only get written when their role changed
+        conn.execute("""
+            INSERT INTO schedule (company_id, employee_id, date, shift, role)
+            SELECT ?, employee_id, date, shift, role FROM staged_schedule WHERE true
+            ON CONFLICT(company_id, employee_id, date, shift) DO UPDATE SET
+                role=excluded.role
+            WHERE role IS NOT excluded.role
+        """, (company_id,))
+        conn.execute("DELETE FROM staged_schedule")
 
-        rows = [
-            (company_id, a["employee_id"], a["date"], a["shift"], a.get("role"))
-            for a in dedup.values()
-            if a["employee_id"] in emp_company and emp_company[a["employee_id"]] == company_id
-        ]
 
-        if rows:
-            conn.executemany("""
-                INSERT INTO schedule (company_id, employee_id, date, shift, role)
-                VALUES (?,?,?,?,?)
-                ON CONFLICT(company_id, employee_id, date, shift) DO UPDATE SET
-                    role=excluded.role
-            """, rows)
+# ---------------- Shift Swap Functions ---------------- #
+_SQL_INSERT_SWAP = """
+    INSERT INTO shift_swaps (company_id, requester_id, target_employee_id, date, shift, status)
+    VALUES (?,?,?,?,?,'pending')
+"""
+
+
+def _insert_swap_request(conn: sqlite3.Connection, company_id: int, requester_id: int,
+                         target_employee_id: int, date: str, shift: str) -> int:
+    # Validate employees and membership
+    req = conn.execute(_SQL_EMPLOYEE_COMPANY, (requester_id,)).fetchone()
+    tgt = conn.execute(_SQL_EMPLOYEE_COMPANY, (target_employee_id,)).fetchone()
+    if not req or not tgt:
+        raise ValueError("Requester and target must be valid employees.")
+    if req["company_id"] != company_id or tgt["company_id"] != company_id:
+        raise ValueError("Both employees must belong to the specified company.")
+    if requester_id == target_employee_id:
+        raise ValueError("Requester and target cannot be the same employee.")
+    # Ensure requester currently holds the shift being swapped
+    has_assignment = conn.execute(
+        "SELECT 1 FROM schedule WHERE company_id=? AND employee_id=? AND date=? AND shift=?",
+        (company_id, requester_id, date, shift)
+    ).fetchone()
+    if not has_assignment:
+        raise ValueError("Requester is not assigned to the given date/shift.")
+
+    return conn.execute(_SQL_INSERT_SWAP, (company_id, requester_id, target_employee_id, date, shift)).lastrowid
 
 
-# ---------------- Shift Swap Functions ---------------- #
 def create_swap_request(company_id: int, requester_id: int,
                         target_employee_id: int, date: str, shift: str) -> None:
     with get_conn() as conn:
-        # Validate employees and membership
-        req = conn.execute("SELECT id, company_id FROM employees WHERE id=?", (requester_id,)).fetchone()
-        tgt = conn.execute("SELECT id, company_id FROM employees WHERE id=?", (target_employee_id,)).fetchone()
-        if not req or not tgt:
-            raise ValueError("Requester and target must be valid employees.")
-        if req["company_id"] != company_id or tgt["company_id"] != company_id:
-            raise ValueError("Both employees must belong to the specified company.")
-        if requester_id == target_employee_id:
-            raise ValueError("Requester and target cannot be the same employee.")
-        # Ensure requester currently holds the shift being swapped
-        has_assignment = conn.execute(
-            "SELECT 1 FROM schedule WHERE company_id=? AND employee_id=? AND date=? AND shift=?",
-            (company_id, requester_id, date, shift)
-        ).fetchone()
-        if not has_assignment:
-            raise ValueError("Requester is not assigned to the given date/shift.")
-
-        conn.execute("""
-            INSERT INTO shift_swaps (company_id, requester_id, target_employee_id, date, shift, status)
-            VALUES (?,?,?,?,?,'pending')
-        """, (company_id, requester_id, target_employee_id, date, shift))
+        _insert_swap_request(conn, company_id, requester_id, target_employee_id, date, shift)
 
 
-def list_swap_requests(company_id: int, status: Optional[str] = None) -> List[Dict[str, Any]]:
-    q = """
-        SELECT ss.*, r.name as requester_name, t.name as target_name
-        FROM shift_swaps ss
-        JOIN employees r ON r.id = ss.requester_id
-        JOIN employees t ON t.id = ss.target_employee_id
-        WHERE ss.company_id=?
+def create_swap_requests(company_id: int, items: List[Dict[str, Any]]) -> List[int]:
+    """
+    Batch variant of create_swap_request.
+    items: list of {requester_id, target_employee_id, date, shift}
+    All requests are validated and inserted in one transaction (one commit);
+    if any item is invalid, none are created. Returns the new ids in input order.
     """
-    args: List[Any] = [company_id]
-    if status:
-        q += " AND ss.status=?"
-        args.append(status)
     with get_conn() as conn:
-        return [dict(row) for row in conn.execute(q, args).fetchall()]
+        return [
+            _insert_swap_request(conn, company_id, it["requester_id"], it["target_employee_id"],
+                                 it["date"], it["shift"])
+            for it in items
+        ]
+
+
+_SQL_LIST_SWAPS = """
+    SELECT ss.*, r.name as requester_name, t.name as target_name
+    FROM shift_swaps ss
+    JOIN employees r ON r.id = ss.requester_id
+    JOIN employees t ON t.id = ss.target_employee_id
+    WHERE ss.company_id=?
+"""
+_SQL_LIST_SWAPS_BY_STATUS = _SQL_LIST_SWAPS + " AND ss.status=?"
+_SQL_PAGE_SWAPS = " ORDER BY ss.id LIMIT ? OFFSET ?"
+
+
+def iter_swap_requests(company_id: int, status: Optional[str] = None,
+                       limit: Optional[int] = None, offset: int = 0) -> Iterator[Dict[str, Any]]:
+    """Stream swap requests (see list_swap_requests)."""
+    # Fixed statements (instead of building the SQL per call) so each variant stays
+    # in the connection's prepared-statement cache
+    if status:
+        q, args = _SQL_LIST_SWAPS_BY_STATUS, (company_id, status)
+    else:
+        q, args = _SQL_LIST_SWAPS, (company_id,)
+    if limit is not None:
+        q, args = q + _SQL_PAGE_SWAPS, args + (limit, offset)
+    with get_read_conn() as conn:
+        yield from _iter_dicts(conn, q, args)
+
+
+def list_swap_requests(company_id: int, status: Optional[str] = None,
+                       limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    Swap requests of a company, optionally filtered by status.
+    Pass `limit` (and `offset`) to page through a long history in id order.
+    """
+    return list(iter_swap_requests(company_id, status, limit, offset))
 
 
 def update_swap_status(request_id: int, status: str, manager_note: Optional[str] = None) -> None:
@@ -484,29 +863,61 @@ def update_swap_status(request_id: int, status: str, manager_note: Optional[str]
 
 
 def apply_approved_swap(company_id: int, date: str, shift: str,
-                        requester_id: int, target_employee_id: int) -> None:
+                        requester_id: int, target_employee_id: int,
+                        request_id: Optional[int] = None,
+                        manager_note: Optional[str] = None) -> None:
     """
     Swap assignment of (date, shift) from requester -> target.
     If target had the same (rare), swap back to requester.
+    When request_id is given, the swap request is marked approved in the same transaction.
     """
+    params = {
+        "company_id": company_id,
+        "date": date,
+        "shift": shift,
+        "requester": requester_id,
+        "target": target_employee_id,
+    }
     with get_conn() as conn:
-        # Atomic, conflict-free swap in a single statement.
-        # This avoids a transient duplicate (company_id, employee_id, date, shift) that would violate idx_schedule_unique.
-        conn.execute("""
-            UPDATE schedule
-            SET employee_id = CASE
-                WHEN employee_id = :requester THEN :target
-                WHEN employee_id = :target THEN :requester
-                ELSE employee_id
-            END
-            WHERE company_id = :company_id
-              AND date = :date
-              AND shift = :shift
-              AND employee_id IN (:requester, :target)
-        """, {
-            "company_id": company_id,
-            "date": date,
-            "shift": shift,
-            "requester": requester_id,
-            "target": target_employee_id,
-        })
+        held = {
+            r["employee_id"]: r["role"]
+            for r in conn.execute("""
+                SELECT employee_id, role FROM schedule
+                WHERE company_id = :company_id AND date = :date AND shift = :shift
+                  AND employee_id IN (:requester, :target)
+            """, params).fetchall()
+        }
+        if len(held) == 2:
+            # Both hold the slot: swapping employee_id row by row would trip
+            # idx_schedule_unique on the first row, and the keys end up identical anyway,
+            # so exchange the roles instead.
+            conn.execute("""
+                UPDATE schedule
+                SET role = CASE employee_id
+                    WHEN :requester THEN :target_role
+                    ELSE :requester_role
+                END
+                WHERE company_id = :company_id
+                  AND date = :date
+                  AND shift = :shift
+                  AND employee_id IN (:requester, :target)
+            """, {**params, "requester_role": held[requester_id], "target_role": held[target_employee_id]})
+        elif held:
+            # Only one side holds it: a single-row move cannot create a duplicate
+            conn.execute("""
+                UPDATE schedule
+                SET employee_id = CASE
+                    WHEN employee_id = :requester THEN :target
+                    ELSE :requester
+                END
+                WHERE company_id = :company_id
+                  AND date = :date
+                  AND shift = :shift
+                  AND employee_id IN (:requester, :target)
+            """, params)
+
+        if request_id is not None:
+            conn.execute(
+                "UPDATE shift_swaps SET status='approved', manager_note=? WHERE id=?",
+                (manager_note, request_id)
+            )
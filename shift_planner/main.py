@@ -1,13 +1,29 @@
 # -*- coding: utf-8 -*-
 import os
 import yaml
+from pathlib import Path
 import pandas as pd
 import streamlit as st
 from PIL import Image
 from dotenv import load_dotenv
 
-# Load .env early
-load_dotenv()
+# Load .env early — once per server process; the script itself re-executes on every rerun
+@st.cache_resource(show_spinner=False)
+def _load_env() -> bool:
+    return load_dotenv()
+
+
+_load_env()
+
+from constants import configure_logging
+
+configure_logging()
+
+# Copy-on-write: .copy()/slices of the session schedule share memory until actually written,
+# so the defensive copies taken on every rerun no longer duplicate the whole frame.
+# pandas 3 always behaves this way and deprecates the option, so only opt in before that.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
 
 # -------------------------
 # Page config (must run first)
@@ -33,6 +49,15 @@ if "theme_mode" not in st.session_state:
 # Theme CSS
 # -------------------------
 
+@st.cache_data(show_spinner=False)
+def _load_modern_css(path: str = "assets/modern_style.css") -> str:
+    """Read the extra stylesheet once; Streamlit reruns reuse the cached text."""
+    try:
+        return Path(path).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return ""
+
+
 def apply_theme(mode: str, safe: bool = True):
     # Core selectors (kept brace-free for f-strings)
     INPUTS = (
@@ -129,13 +154,9 @@ def apply_theme(mode: str, safe: bool = True):
     """
     
     # Load additional modern styles
-    css_content = ""
-    try:
-        with open("assets/modern_style.css", "r", encoding="utf-8") as f:
-            css_content = f"<style>{f.read()}</style>"
-    except FileNotFoundError:
-        pass
-    
+    modern_css = _load_modern_css()
+    css_content = f"<style>{modern_css}</style>" if modern_css else ""
+
     st.markdown(CSS_DARK if mode == "dark" else CSS_LIGHT, unsafe_allow_html=True)
     if css_content:
         st.markdown(css_content, unsafe_allow_html=True)
@@ -212,6 +233,13 @@ DEV_AUTH_FALLBACK = os.getenv("DEV_AUTH_FALLBACK", "false").strip().lower() in (
 # Auth gate (streamlit-authenticator, dev-friendly but not silent)
 # -------------------------
 
+@st.cache_data(show_spinner=False)
+def _load_auth_config(path: str, mtime: float) -> dict:
+    """Parse the auth YAML once per file version (mtime is the cache key); each rerun gets its own copy."""
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
 def _auth_gate():
     """Gate the app with optional authentication, enforced in production.
 
@@ -229,9 +257,8 @@ def _auth_gate():
     authenticator = None
     try:
         import streamlit_authenticator as stauth
-        with open(cfg_path, "r", encoding="utf-8") as f:
-            auth_cfg = yaml.safe_load(f)
-        
+        auth_cfg = _load_auth_config(cfg_path, os.path.getmtime(cfg_path))
+
         # Suppress signature verification warnings (they'll be cleared on next login)
         import warnings
         warnings.filterwarnings("ignore", message=".*Signature verification failed.*")
@@ -12,19 +12,24 @@ Public API:
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from dataclasses import dataclass, field
+import functools
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from collections import defaultdict, Counter
 import datetime as dt
+import numpy as np
 import pandas as pd
 import re
-from constants import DAYS, SHIFT_TIMES
+from constants import DAYS, SHIFT_TIMES, labor_rules, shift_hours as _shift_len
+
+# Wall-clock budget for the CBC solve; CBC returns its best incumbent when the limit is hit
+MILP_TIME_LIMIT_S = 10
 
 # AI-powered scheduling
 try:
     from ai_scheduler import (
         analyze_schedule_with_ai,
-        optimize_employee_assignments_with_ai,
+        optimize_employee_assignments_batch_with_ai,
         resolve_conflicts_with_ai
     )
     AI_AVAILABLE = True
@@ -57,37 +62,38 @@ def generate_schedule_smart(
     weights=None,
 ):
     """
-    Prefer MILP optimizer if PuLP is available; otherwise fall back to the greedy v2.
-    Also guards any optimizer build/solve exceptions to ensure a safe fallback.
+    Greedy v2 first; the MILP optimizer only runs when greedy leaves minimums uncovered.
+    v2 enforces the same labor rules in milliseconds, and when it covers every slot the
+    MILP cannot improve coverage, only spend its time limit on fairness/preferences
+    (so `weights` only matters for the understaffed case). Falls back to the greedy
+    result if PuLP is missing or the optimizer fails or returns no solution.
     """
+    greedy = generate_schedule_v2(
+        start_date, employees, active_shifts, roles, rules, role_settings, days_count, work_model
+    )
+    if greedy[1].empty:
+        return greedy
     try:
         import pulp  # noqa: F401
     except Exception as e:
-        import traceback
         print("PuLP not importable; using greedy v2:", e)
-        traceback.print_exc()
-        return generate_schedule_v2(
-            start_date, employees, active_shifts, roles, rules, role_settings, days_count, work_model
-        )
+        return greedy
     # PuLP present — attempt optimizer but guard failures explicitly
     try:
-        return generate_schedule_opt(
+        opt = generate_schedule_opt(
             start_date, employees, active_shifts, roles, rules, role_settings, days_count, work_model, weights
         )
     except Exception as e:
         import traceback
         print("MILP scheduling raised; falling back to greedy v2:", e)
         traceback.print_exc()
-        return generate_schedule_v2(
-            start_date, employees, active_shifts, roles, rules, role_settings, days_count, work_model
-        )
+        return greedy
+    return opt if _missing_total(opt[1]) <= _missing_total(greedy[1]) else greedy
 
 
+def _missing_total(missing_df: pd.DataFrame) -> int:
+    return int(missing_df["Λείπουν"].sum()) if not missing_df.empty else 0
 
-def _shift_len(shift: str) -> int:
-    """Return the (positive) hours of a shift, handling wrap-around (e.g., 22→06)."""
-    s, e = SHIFT_TIMES.get(shift, (9, 17))
-    return (24 - s + e) if e < s else (e - s)
 
 def _date(obj) -> dt.date:
     return pd.to_datetime(obj).date()
@@ -95,21 +101,31 @@ def _date(obj) -> dt.date:
 def _weekday_name(d: dt.date) -> str:
     return DAYS[d.weekday()]
 
+# Start/end hours of the known shifts, resolved once; unknown labels fall back to 09:00–17:00
+_SHIFT_START = {k: s for k, (s, e) in SHIFT_TIMES.items()}
+_SHIFT_END = {k: e if e >= s else e + 24 for k, (s, e) in SHIFT_TIMES.items()}  # allow wrap past midnight (e.g., 02:00 → 26)
+
 def _shift_start_hour(shift: str) -> int:
-    return SHIFT_TIMES.get(shift, (9, 17))[0]
+    return _SHIFT_START.get(shift, 9)
 
 def _shift_end_hour(shift: str) -> int:
-    s, e = SHIFT_TIMES.get(shift, (9, 17))
-    return e if e >= s else e + 24  # allow wrap past midnight (e.g., 02:00 → 26)
+    return _SHIFT_END.get(shift, 17)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Employee:
     id: int
     name: str
     roles: List[str]
     availability: List[str]
+    # Hash-set views for the O(1) membership tests in the generators' inner loops
+    role_set: FrozenSet[str] = field(init=False, repr=False, compare=False)
+    availability_set: FrozenSet[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "role_set", frozenset(self.roles))
+        object.__setattr__(self, "availability_set", frozenset(self.availability))
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Assignment:
     date: dt.date
     shift: str
@@ -118,30 +134,98 @@ class Assignment:
     hours: int
 
 
+def _feasible_domains(
+    emps: List[Employee],
+    active_shifts: List[str],
+    roles: List[str],
+    max_daily_hours: int,
+    weekly_hours_cap: int,
+) -> Dict[Tuple[str, str], List[Employee]]:
+    """
+    Constraint-propagation pre-pass: per (shift, role), the employees that satisfy the unary
+    constraints (availability, role) and for whom one such shift fits the daily/weekly caps.
+    Computed once per run so the search only ever looks at these lists (employee order kept).
+    """
+    # Encode availability/roles as bitmasks over this run's shifts/roles; eligibility is then an AND
+    shift_bit = {s: 1 << i for i, s in enumerate(active_shifts)}
+    role_bit = {r: 1 << i for i, r in enumerate(roles)}
+    masks = [
+        (sum(b for s, b in shift_bit.items() if s in e.availability_set),
+         sum(b for r, b in role_bit.items() if r in e.role_set))
+        for e in emps
+    ]
+
+    domains: Dict[Tuple[str, str], List[Employee]] = {}
+    for s in active_shifts:
+        hrs = _shift_len(s)
+        fits = hrs <= max_daily_hours and hrs <= weekly_hours_cap
+        sb = shift_bit[s]
+        on_shift = [(e, rm) for e, (am, rm) in zip(emps, masks) if fits and am & sb]
+        for r in roles:
+            rb = role_bit[r]
+            domains[(s, r)] = [e for e, rm in on_shift if rm & rb]
+    return domains
+
+
 # ----------------------------
 # Rule checks
 # ----------------------------
 
 
+@functools.lru_cache(maxsize=1024)
+def _parse_clock(t) -> Optional[Tuple[int, int]]:
+    """(hour % 24, minute) for a time cell, or None if invalid. Accepts:
+    - 'HH:MM', 'H:MM', 'HH.MM', 'H.M', 'HH', 'H'
+    - integers/floats (hours), strings with decimal separator '.' or ',' interpreted as hours (e.g., 9.5 => 09:30)
+    Memoized: a roster repeats the same few start/end values on every row.
+    """
+    import math
+    try:
+        # Numeric types (including strings like '9.5')
+        if isinstance(t, (int, float)):
+            hh = int(math.floor(float(t)))
+            mm = int(round((float(t) - hh) * 60))
+            if mm == 60:
+                hh += 1; mm = 0
+            if not (0 <= hh <= 48 and 0 <= mm < 60):
+                return None
+            return int(hh) % 24, mm
+        s = str(t).strip()
+        s_num = s.replace(',', '.')
+        # If purely numeric with optional decimal
+        if re.fullmatch(r"\d+(?:[\.,]\d+)?", s):
+            val = float(s_num)
+            hh = int(math.floor(val))
+            mm = int(round((val - hh) * 60))
+            if mm == 60:
+                hh += 1; mm = 0
+            if not (0 <= hh <= 48 and 0 <= mm < 60):
+                return None
+            return int(hh) % 24, mm
+        # Replace '.' with ':' if it's a separator variant like '9.00'
+        s = s.replace('.', ':').replace(',', ':')
+        parts = s.split(':')
+        if len(parts) == 1:
+            hh, mm = int(parts[0]), 0
+        else:
+            hh, mm = int(parts[0]), int(parts[1])
+        if not (0 <= hh <= 48 and 0 <= mm < 60):  # basic sanity
+            return None
+        return int(hh) % 24, mm
+    except Exception:
+        return None
+
+
 def check_violations(schedule_df, rules: dict, work_model: str = "5ήμερο"):
     import pandas as pd
     from datetime import datetime, timedelta
 
     # --- Rule parameters (by work model) ---
-    wm = (work_model or "").strip()
-    if wm == "5ήμερο":
-        max_daily_hours = int(rules.get("max_daily_hours_5days", 8))
-        weekly_hours_cap = int(rules.get("weekly_hours_5days", 40))
-    elif wm == "6ήμερο":
-        max_daily_hours = int(rules.get("max_daily_hours_6days", 9))
-        weekly_hours_cap = int(rules.get("weekly_hours_6days", 48))
-    else:  # 7ήμερο
-        max_daily_hours = int(rules.get("max_daily_hours_7days", 9))
-        weekly_hours_cap = int(rules.get("weekly_hours_7days", 56))
-
-    min_daily_rest = int(rules.get("min_daily_rest", 11))
-    max_consecutive_days = int(rules.get("max_consecutive_days", 6))
-    monthly_hours_cap = int(rules.get("monthly_hours", 160))
+    lr = labor_rules(rules, work_model)
+    max_daily_hours, weekly_hours_cap = lr.max_daily_hours, lr.weekly_hours
+    min_daily_rest = lr.min_daily_rest
+    max_consecutive_days = lr.max_consecutive_days
+    monthly_hours_cap = lr.monthly_hours
 
     # --- Normalize dates/hours ---
     df = schedule_df.copy()
@@ -155,7 +239,7 @@ def check_violations(schedule_df, rules: dict, work_model: str = "5ήμερο"):
     violations = []
 
     # --- A) Max daily hours per employee ---
-    daily_hours = df.groupby(["Υπάλληλος", "Ημερομηνία"], as_index=False)["Ώρες"].sum()
+    daily_hours = df.groupby(["Υπάλληλος", "Ημερομηνία"], as_index=False, observed=True)["Ώρες"].sum()
     for _, row in daily_hours.iterrows():
         if row["Ώρες"] > max_daily_hours:
             violations.append({
@@ -172,7 +256,7 @@ def check_violations(schedule_df, rules: dict, work_model: str = "5ήμερο"):
     dt_series = pd.to_datetime(df["Ημερομηνία"])
     df["_iso_year"] = dt_series.dt.isocalendar().year
     df["_iso_week"] = dt_series.dt.isocalendar().week
-    weekly_hours = df.groupby(["Υπάλληλος", "_iso_year", "_iso_week"], as_index=False)["Ώρες"].sum()
+    weekly_hours = df.groupby(["Υπάλληλος", "_iso_year", "_iso_week"], as_index=False, observed=True)["Ώρες"].sum()
     for _, row in weekly_hours.iterrows():
         if row["Ώρες"] > weekly_hours_cap:
             violations.append({
@@ -187,7 +271,7 @@ def check_violations(schedule_df, rules: dict, work_model: str = "5ήμερο"):
 
     # --- C) Monthly hours cap (calendar month) ---
     df["_month"] = pd.to_datetime(df["Ημερομηνία"]).dt.to_period("M")
-    monthly_hours = df.groupby(["Υπάλληλος", "_month"], as_index=False)["Ώρες"].sum()
+    monthly_hours = df.groupby(["Υπάλληλος", "_month"], as_index=False, observed=True)["Ώρες"].sum()
     for _, row in monthly_hours.iterrows():
         if row["Ώρες"] > monthly_hours_cap:
             violations.append({
@@ -201,7 +285,7 @@ def check_violations(schedule_df, rules: dict, work_model: str = "5ήμερο"):
             })
 
     # --- D) Max consecutive working days ---
-    for emp, sub in df.groupby("Υπάλληλος"):
+    for emp, sub in df.groupby("Υπάλληλος", observed=True):
         worked_days = sorted(set(sub.loc[sub["Ώρες"] > 0, "Ημερομηνία"]))
         if not worked_days:
             continue
@@ -230,80 +314,52 @@ def check_violations(schedule_df, rules: dict, work_model: str = "5ήμερο"):
 
         # Expecting times as HH:MM or datetime; coerce to datetimes anchored on date
         def _coerce_dt(d, t):
-            """Return (datetime_or_none, is_valid). Accepts:
-            - 'HH:MM', 'H:MM', 'HH.MM', 'H.M', 'HH', 'H'
-            - integers/floats (hours), strings with decimal separator '.' or ',' interpreted as hours (e.g., 9.5 => 09:30)
-            - datetime
-            If parsing fails or minutes are invalid, returns (None, False).
-            """
+            """Return (datetime_or_none, is_valid); see _parse_clock for accepted time formats."""
             from datetime import datetime
-            import math
             if pd.isna(t):
                 return None, False
             if isinstance(t, datetime):
                 return t, True
             try:
-                # Numeric types (including strings like '9.5')
-                if isinstance(t, (int, float)):
-                    hh = int(math.floor(float(t)))
-                    mm = int(round((float(t) - hh) * 60))
-                    if mm == 60:
-                        hh += 1; mm = 0
-                    if not (0 <= hh <= 48 and 0 <= mm < 60):
-                        return None, False
-                    return datetime(d.year, d.month, d.day, int(hh) % 24, mm), True
-                s = str(t).strip()
-                s_num = s.replace(',', '.')
-                # If purely numeric with optional decimal
-                if re.fullmatch(r"\d+(?:[\.,]\d+)?", s):
-                    val = float(s_num)
-                    hh = int(math.floor(val))
-                    mm = int(round((val - hh) * 60))
-                    if mm == 60:
-                        hh += 1; mm = 0
-                    if not (0 <= hh <= 48 and 0 <= mm < 60):
-                        return None, False
-                    return datetime(d.year, d.month, d.day, int(hh) % 24, mm), True
-                # Replace '.' with ':' if it's a separator variant like '9.00'
-                s = s.replace('.', ':').replace(',', ':')
-                parts = s.split(':')
-                if len(parts) == 1:
-                    hh, mm = int(parts[0]), 0
-                else:
-                    hh, mm = int(parts[0]), int(parts[1])
-                if not (0 <= hh <= 48 and 0 <= mm < 60):  # basic sanity
-                    return None, False
-                return datetime(d.year, d.month, d.day, int(hh) % 24, mm), True
-            except Exception:
+                hm = _parse_clock(t)
+            except TypeError:  # unhashable cell value
+                hm = _parse_clock.__wrapped__(t)
+            if hm is None:
                 return None, False
+            return datetime(d.year, d.month, d.day, hm[0], hm[1]), True
 
         # Now check rest periods between consecutive shifts for each employee
-        for emp, sub in df.groupby("Υπάλληλος"):
-            sub_sorted = sub.sort_values("Ημερομηνία").copy()
-            for i in range(len(sub_sorted) - 1):
-                row1 = sub_sorted.iloc[i]
-                row2 = sub_sorted.iloc[i + 1]
-                
-                end1, valid_e = _coerce_dt(row1["Ημερομηνία"], row1[e_col])
-                start2, valid_s = _coerce_dt(row2["Ημερομηνία"], row2[s_col])
-                
+        # Pull plain column lists once and coerce each row a single time; row-wise
+        # .iloc access inside the pair loop dominated the cost on long schedules.
+        for emp, sub in df.groupby("Υπάλληλος", observed=True):
+            sub_sorted = sub.sort_values("Ημερομηνία")
+            dates = sub_sorted["Ημερομηνία"].tolist()
+            ends = [_coerce_dt(d, t) for d, t in zip(dates, sub_sorted[e_col].tolist())]
+            starts = [_coerce_dt(d, t) for d, t in zip(dates, sub_sorted[s_col].tolist())]
+            blank = [""] * len(dates)
+            shifts = sub_sorted["Βάρδια"].tolist() if "Βάρδια" in sub_sorted.columns else blank
+            roles_ = sub_sorted["Ρόλος"].tolist() if "Ρόλος" in sub_sorted.columns else blank
+            for i in range(len(dates) - 1):
+                end1, valid_e = ends[i]
+                start2, valid_s = starts[i + 1]
+
                 if not (valid_e and valid_s):
                     continue
-                
+
                 # Handle shifts that span midnight
                 if end1 and start2:
                     # If end time is in next day, adjust
-                    if end1.time() < start2.time() and row2["Ημερομηνία"] == row1["Ημερομηνία"]:
+                    if end1.time() < start2.time() and dates[i + 1] == dates[i]:
                         end1 = end1 + timedelta(days=1)
-                    
+
                     rest_hours = (start2 - end1).total_seconds() / 3600
-                    
+
                     if rest_hours < min_daily_rest and rest_hours >= 0:
                         violations.append({
-                            "Ημερομηνία": row2["Ημερομηνία"],
+                            "Ημερομηνία": dates[i + 1],
                             "Υπάλληλος": emp,
-                            "Βάρδια": row2.get("Βάρδια", ""),
-                            "Ρόλος": row2.get("Ρόλος", ""),
+                            "Βάρδια": shifts[i + 1],
+                            "Ρόλος": roles_[i + 1],
                             "Rule": "min_daily_rest",
                             "Details": f"{rest_hours:.1f}h rest < {min_daily_rest}h required",
                             "Severity": "high",
@@ -358,48 +414,51 @@ def generate_schedule_v2(
 
     assigned = []
     hours_by_emp_week: Dict[str, Counter] = defaultdict(Counter)
+    hours_by_emp_day: Counter = Counter()        # (name, date) -> hours
+    shifts_by_emp: Counter = Counter()           # name -> assignments so far
+    used_on_day: Dict[dt.date, set] = defaultdict(set)
     last_shift_by_emp: Dict[str, tuple[dt.date, str]] = {}
 
-    wm = work_model.strip()
-    if wm == "5ήμερο":
-        max_daily_hours = int(rules.get("max_daily_hours_5days", 8))
-        weekly_hours_cap = int(rules.get("weekly_hours_5days", 40))
-    elif wm == "6ήμερο":
-        max_daily_hours = int(rules.get("max_daily_hours_6days", 9))
-        weekly_hours_cap = int(rules.get("weekly_hours_6days", 48))
-    else:  # 7ήμερο
-        max_daily_hours = int(rules.get("max_daily_hours_7days", 9))
-        weekly_hours_cap = int(rules.get("weekly_hours_7days", 56))
-    min_daily_rest = int(rules.get("min_daily_rest", 11))
-    max_consecutive_days = int(rules.get("max_consecutive_days", 6))
-
-    def week_of_iso(d: dt.date) -> int:
-        return d.isocalendar().week
+    lr = labor_rules(rules, work_model)
+    max_daily_hours, weekly_hours_cap = lr.max_daily_hours, lr.weekly_hours
+    min_daily_rest = lr.min_daily_rest
+    max_consecutive_days = lr.max_consecutive_days
+
+    domains = _feasible_domains(emps, active_shifts, roles, max_daily_hours, weekly_hours_cap)
+
+    # (weekday name, ISO date) per day, built once and shared by the loop and the output frame
+    dates = [start + dt.timedelta(days=i) for i in range(days_count)]
+    day_labels = {d: (_weekday_name(d), d.isoformat()) for d in dates}
+
+    # can_assign runs for every (employee, slot) pair, so resolve its per-day and
+    # per-shift inputs once per run instead of per call
+    iso_week = {d: d.isocalendar().week for d in dates}
+    week_of_iso = iso_week.__getitem__
+    day_before = {d: d - dt.timedelta(days=1) for d in dates}
+    hours_of = {s: _shift_len(s) for s in active_shifts}
+
+    # Rest hours between a shift on day D-1 and each shift on day D, per (prev, next) pair.
+    # End hours past 24 already carry the wrap, so the gap is a fixed 24 + start - end.
+    rest_after = {
+        (a, b): 24 + _shift_start_hour(b) - _shift_end_hour(a)
+        for a in active_shifts for b in active_shifts
+    }
 
     def can_assign(emp: Employee, d: dt.date, shift: str, role: str) -> bool:
-        if shift not in emp.availability or role not in emp.roles:
+        if shift not in emp.availability_set or role not in emp.role_set:
             return False
         # daily cap
-        cur_hours = sum(a.hours for a in assigned if a.employee == emp.name and a.date == d)
-        if cur_hours + _shift_len(shift) > max_daily_hours:
+        hrs = hours_of[shift]
+        if hours_by_emp_day[(emp.name, d)] + hrs > max_daily_hours:
             return False
         # weekly cap
-        wk = week_of_iso(d)
-        if hours_by_emp_week[emp.name][wk] + _shift_len(shift) > weekly_hours_cap:
+        if hours_by_emp_week[emp.name][iso_week[d]] + hrs > weekly_hours_cap:
             return False
         
         # min rest against previous day (compute precisely across midnight)
-        if emp.name in last_shift_by_emp and last_shift_by_emp[emp.name][0] == d - dt.timedelta(days=1):
-            prev_date, prev_shift = last_shift_by_emp[emp.name]
-            end_h = _shift_end_hour(prev_shift)  # may be > 24 if wraps
-            # Anchor end on previous date (add a day if it wraps past midnight)
-            prev_end_dt = dt.datetime(prev_date.year, prev_date.month, prev_date.day, end_h % 24)
-            if end_h >= 24:
-                prev_end_dt += dt.timedelta(days=1)
-            start_h = _shift_start_hour(shift)
-            next_start_dt = dt.datetime(d.year, d.month, d.day, start_h)
-            hours_rest = (next_start_dt - prev_end_dt).total_seconds() / 3600.0
-            if hours_rest < min_daily_rest:
+        last = last_shift_by_emp.get(emp.name)
+        if last is not None and last[0] == day_before[d]:
+            if rest_after[(last[1], shift)] < min_daily_rest:
                 return False
 
         return True
@@ -415,14 +474,46 @@ def generate_schedule_v2(
         # Weekly fairness (prefer lower current weekly hours)
         sc += max(0, 20 - hours_by_emp_week[emp.name][week_of_iso(d)]) * 0.2
         # Prefer employees not yet used that day
-        if emp.name not in {a.employee for a in assigned if a.date == d}:
+        if emp.name not in used_on_day[d]:
             sc += 1.0
         return sc
 
-    missing_rows = []
-    for i in range(days_count):
-        d = start + dt.timedelta(days=i)
-        day_label = _weekday_name(d)
+    def ai_rankings_for_day(d: dt.date) -> Dict[Tuple[str, str], List[str]]:
+        """One batched AI request ranking candidates for every (shift, role) slot of day d."""
+        slots, tasks = [], []
+        for shift in active_shifts:
+            for role in roles:
+                if min_per.get(role, 0) <= 0:
+                    continue
+                candidates = [e for e in domains[(shift, role)] if can_assign(e, d, shift, role)]
+                if len(candidates) <= 1:
+                    continue
+                slots.append((shift, role))
+                tasks.append({
+                    "date": str(d),
+                    "shift": shift,
+                    "role": role,
+                    "candidates": [{
+                        "name": e.name,
+                        "roles": e.roles,
+                        "day_hours": hours_by_emp_day[(e.name, d)],
+                        "week_hours": hours_by_emp_week[e.name][week_of_iso(d)],
+                        "total_shifts": shifts_by_emp[e.name],
+                    } for e in candidates],
+                })
+        if not tasks:
+            return {}
+        try:
+            ranked = optimize_employee_assignments_batch_with_ai(tasks, rules, work_model)
+        except Exception as e:
+            print(f"AI selection error: {e}")
+            return {}
+        return {slot: names for slot, names in zip(slots, ranked) if names}
+
+    missing_counts: Counter = Counter()  # (day, date, shift, role) -> unfilled slots
+    for d in dates:
+        day_label, date_str = day_labels[d]
+        ai_ranked = ai_rankings_for_day(d) if AI_AVAILABLE else {}
         for shift in active_shifts:
             for role in roles:
                 need = min_per.get(role, 0)
@@ -430,57 +521,30 @@ def generate_schedule_v2(
                     continue
                 picks = []
                 for _ in range(need):
-                    candidates = [e for e in emps if can_assign(e, d, shift, role)]
+                    candidates = [e for e in domains[(shift, role)] if can_assign(e, d, shift, role)]
                     if not candidates:
-                        missing_rows.append({
-                            "Ημέρα": day_label,
-                            "Ημερομηνία": str(d),
-                            "Βάρδια": shift,
-                            "Ρόλος": role,
-                            "Λείπουν": max(1, need - len(picks)),
-                        })
+                        missing_counts[(day_label, date_str, shift, role)] += max(1, need - len(picks))
                         break
                     
-                    # Use AI to select best employee if available
-                    if AI_AVAILABLE and len(candidates) > 1:
-                        try:
-                            temp_df = pd.DataFrame([{
-                                "Ημερομηνία": str(a.date),
-                                "Βάρδια": a.shift,
-                                "Υπάλληλος": a.employee,
-                                "Ρόλος": a.role,
-                                "Ώρες": a.hours
-                            } for a in assigned])
-                            
-                            candidate_dicts = [
-                                {"name": e.name, "roles": e.roles, "availability": e.availability}
-                                for e in candidates
-                            ]
-                            
-                            ai_selected = optimize_employee_assignments_with_ai(
-                                d, shift, role, candidate_dicts, temp_df, rules, work_model
-                            )
-                            
-                            # Find best from AI suggestions
-                            best = next((e for e in candidates if e.name in ai_selected), None)
-                            if not best:
-                                best = max(candidates, key=lambda e: score(e, d, shift, role))
-                        except Exception as e:
-                            print(f"AI selection error: {e}")
-                            best = max(candidates, key=lambda e: score(e, d, shift, role))
-                    else:
+                    # Prefer the AI ranking for this slot (still re-checked via can_assign above)
+                    by_name = {e.name: e for e in candidates}
+                    best = next((by_name[n] for n in ai_ranked.get((shift, role), []) if n in by_name), None)
+                    if not best:
                         best = max(candidates, key=lambda e: score(e, d, shift, role))
                     
-                    hrs = _shift_len(shift)
+                    hrs = hours_of[shift]
                     assigned.append(Assignment(d, shift, best.name, role, hrs))
                     hours_by_emp_week[best.name][week_of_iso(d)] += hrs
+                    hours_by_emp_day[(best.name, d)] += hrs
+                    shifts_by_emp[best.name] += 1
+                    used_on_day[d].add(best.name)
                     last_shift_by_emp[best.name] = (d, shift)
                     picks.append(best.name)
 
     sched_df = pd.DataFrame(
         [{
-            "Ημέρα": _weekday_name(a.date),
-            "Ημερομηνία": str(a.date),
+            "Ημέρα": day_labels[a.date][0],
+            "Ημερομηνία": day_labels[a.date][1],
             "Βάρδια": a.shift,
             "Υπάλληλος": a.employee,
             "Ρόλος": a.role,
@@ -489,7 +553,10 @@ def generate_schedule_v2(
         columns=["Ημέρα", "Ημερομηνία", "Βάρδια", "Υπάλληλος", "Ρόλος", "Ώρες"],
     )
 
-    missing_df = pd.DataFrame(missing_rows, columns=["Ημέρα", "Ημερομηνία", "Βάρδια", "Ρόλος", "Λείπουν"])
+    missing_df = pd.DataFrame.from_records(
+        [(*key, n) for key, n in missing_counts.items()],
+        columns=["Ημέρα", "Ημερομηνία", "Βάρδια", "Ρόλος", "Λείπουν"],
+    )
     return sched_df, missing_df
 
 
@@ -528,42 +595,36 @@ def auto_fix_schedule(
     ]
 
     min_per = {r: max(0, int(role_settings.get(r, {}).get("min_per_shift", 1))) for r in roles}
-    grouped = sched.groupby(["Ημερομηνία", "Βάρδια", "Ρόλος"]).size().reset_index(name="count")
-    existing = {(r["Ημερομηνία"], r["Βάρδια"], r["Ρόλος"]): r["count"] for _, r in grouped.iterrows()}
+    existing = sched.groupby(["Ημερομηνία", "Βάρδια", "Ρόλος"], observed=True).size().to_dict()
+
+    # Lookup tables built once with vectorized groupbys instead of re-masking `sched` per candidate
+    occupied = set(zip(sched["Ημερομηνία"], sched["Βάρδια"], sched["Υπάλληλος"]))
+    day_hours = sched.groupby(["Υπάλληλος", "Ημερομηνία"], observed=True)["Ώρες"].sum().to_dict()
+    iso_week = pd.to_datetime(sched["Ημερομηνία"]).dt.isocalendar().week.astype(int)
+    week_hours = sched["Ώρες"].groupby([sched["Υπάλληλος"], iso_week], observed=True).sum().to_dict()
+
+    # Same per-(shift, role) candidate lists the generators search, built once per run
+    lr = labor_rules(rules, work_model)
+    eligible_by_slot = _feasible_domains(emps, active_shifts, roles, lr.max_daily_hours, lr.weekly_hours)
 
     rows_to_add = []
     all_dates = sorted(sched["Ημερομηνία"].unique())
     for d in all_dates:
+        week = d.isocalendar().week
         for shift in active_shifts:
             for role in roles:
                 cur = existing.get((d, shift, role), 0)
                 need = max(0, min_per.get(role, 0) - cur)
                 for _ in range(need):
                     # Eligible candidates
-                    candidates = []
-                    for e in emps:
-                        if shift not in e.availability or role not in e.roles:
-                            continue
-                        clash = ((sched["Ημερομηνία"] == d) &
-                                 (sched["Βάρδια"] == shift) &
-                                 (sched["Υπάλληλος"] == e.name)).any()
-                        if clash:
-                            continue
-                        candidates.append(e)
+                    candidates = [
+                        e for e in eligible_by_slot[(shift, role)] if (d, shift, e.name) not in occupied
+                    ]
                     if not candidates:
                         continue
 
                     def emp_load(e: Employee) -> Tuple[int, int]:
-                        day_load = int(sched[(sched["Ημερομηνία"] == d) &
-                                             (sched["Υπάλληλος"] == e.name)]["Ώρες"].sum())
-                        week = d.isocalendar().week
-                        wk_load = 0
-                        for dd in sched["Ημερομηνία"].unique():
-                            dd_date = dd if isinstance(dd, dt.date) else dt.date.fromisoformat(str(dd))
-                            if dd_date.isocalendar().week == week:
-                                wk_load += int(sched[(sched["Ημερομηνία"] == dd_date) &
-                                                     (sched["Υπάλληλος"] == e.name)]["Ώρες"].sum())
-                        return (day_load, wk_load)
+                        return (int(day_hours.get((e.name, d), 0)), int(week_hours.get((e.name, week), 0)))
 
                     best = sorted(candidates, key=lambda e: emp_load(e))[0]
                     rows_to_add.append({
@@ -636,18 +697,10 @@ def generate_schedule_opt(
         return _shift_end_hour(s)
 
     # Rules by work model
-    wm = (work_model or "").strip()
-    if wm == "5ήμερο":
-        max_daily_hours = int(rules.get("max_daily_hours_5days", 8))
-        weekly_hours_cap = int(rules.get("weekly_hours_5days", 40))
-    elif wm == "6ήμερο":
-        max_daily_hours = int(rules.get("max_daily_hours_6days", 9))
-        weekly_hours_cap = int(rules.get("weekly_hours_6days", 48))
-    else:
-        max_daily_hours = int(rules.get("max_daily_hours_7days", 9))
-        weekly_hours_cap = int(rules.get("weekly_hours_7days", 56))
-    min_daily_rest = int(rules.get("min_daily_rest", 11))
-    max_consecutive_days = int(rules.get("max_consecutive_days", 6))
+    lr = labor_rules(rules, work_model)
+    max_daily_hours, weekly_hours_cap = lr.max_daily_hours, lr.weekly_hours
+    min_daily_rest = lr.min_daily_rest
+    max_consecutive_days = lr.max_consecutive_days
 
     # Role settings
     min_per = {r: max(0, int(role_settings.get(r, {}).get("min_per_shift", 1))) for r in roles}
@@ -669,19 +722,28 @@ def generate_schedule_opt(
     # Model
     m = pulp.LpProblem("ShiftScheduling", pulp.LpMinimize)
 
-    # Variables
+    # Variables: only create x for feasible (employee, shift, role) combinations; infeasible
+    # cells used to be fixed-to-zero binaries that still bloated every constraint row.
+    # The propagation pre-pass also drops shifts longer than the daily/weekly caps.
+    domains = _feasible_domains(Emps, active_shifts, roles, max_daily_hours, weekly_hours_cap)
     x = {}
+    by_dsr = defaultdict(list)   # (d, s, r) -> vars, in employee order
+    by_eds = defaultdict(list)   # (e, d, s) -> vars
+    by_ed = defaultdict(list)    # (e, d)    -> (hours, var)
     for e in Emps:
+        e_cells = [(s, r) for s in active_shifts for r in roles if e in domains[(s, r)]]
         for d in dates:
-            for s in active_shifts:
-                for r in roles:
-                    feasible = (r in e.roles) and (s in e.availability)
-                    lb, ub = (0, 1) if feasible else (0, 0)
-                    x[(e.name, d, s, r)] = pulp.LpVariable(f"x_{e.id}_{d}_{s}_{r}", lb, ub, cat="Binary")
-
-    # Under/over staffing slack per (d,s,r)
+            for s, r in e_cells:
+                v = pulp.LpVariable(f"x_{e.id}_{d}_{s}_{r}", 0, 1, cat="Binary")
+                x[(e.name, d, s, r)] = v
+                by_dsr[(d, s, r)].append((e.name, v))
+                by_eds[(e.name, d, s)].append(v)
+                by_ed[(e.name, d)].append((_slen(s), v))
+
+    # Under/over staffing slack per (d,s,r); 'ex' counts heads above the minimum
     u = {(d, s, r): pulp.LpVariable(f"under_{d}_{s}_{r}", lowBound=0) for d in dates for s in active_shifts for r in roles}
     o = {(d, s, r): pulp.LpVariable(f"over_{d}_{s}_{r}",  lowBound=0) for d in dates for s in active_shifts for r in roles}
+    ex = {(d, s, r): pulp.LpVariable(f"extra_{d}_{s}_{r}", lowBound=0) for d in dates for s in active_shifts for r in roles}
 
     # Fairness vars per employee-week
     week_of_iso = lambda d: d.isocalendar().week
@@ -692,50 +754,50 @@ def generate_schedule_opt(
 
     # --- Constraints ---
 
-    # Coverage with slacks (and soft cap via 'o')
+    # Coverage with slacks: 'u' absorbs shortfall below the minimum, 'ex' any staffing
+    # above it, 'o' the excess over the soft cap
     for d in dates:
         for s in active_shifts:
             for r in roles:
-                m += (pulp.lpSum(x[(e.name, d, s, r)] for e in Emps) + o[(d, s, r)] - u[(d, s, r)] == min_per.get(r, 0))
-                m += (pulp.lpSum(x[(e.name, d, s, r)] for e in Emps) <= max_per.get(r, 9999) + o[(d, s, r)])
+                staffed = pulp.lpSum(v for _, v in by_dsr[(d, s, r)])
+                m += (staffed + u[(d, s, r)] - ex[(d, s, r)] == min_per.get(r, 0))
+                m += (staffed <= max_per.get(r, 9999) + o[(d, s, r)])
 
     # At most one role per employee per (date, shift)
-    for e in Emps:
-        for d in dates:
-            for s in active_shifts:
-                m += pulp.lpSum(x[(e.name, d, s, r)] for r in roles) <= 1
+    for vs in by_eds.values():
+        if len(vs) > 1:
+            m += pulp.lpSum(vs) <= 1
 
     # Daily hours cap
-    for e in Emps:
-        for d in dates:
-            m += pulp.lpSum(_slen(s) * pulp.lpSum(x[(e.name, d, s, r)] for r in roles) for s in active_shifts) <= max_daily_hours
+    for terms in by_ed.values():
+        m += pulp.lpSum(h * v for h, v in terms) <= max_daily_hours
 
     # Weekly hours cap + define H(e, week)
     for e in Emps:
         for w in weeks:
             relevant_dates = [d for d in dates if week_of_iso(d) == w]
             m += H[(e.name, w)] == pulp.lpSum(
-                _slen(s) * pulp.lpSum(x[(e.name, d, s, r)] for r in roles)
-                for d in relevant_dates for s in active_shifts
+                h * v for d in relevant_dates for h, v in by_ed.get((e.name, d), ())
             )
             m += H[(e.name, w)] <= weekly_hours_cap
 
     # Min daily rest: forbid specific (prev, next) shift pairs across consecutive days
+    # The offending pairs depend only on the shift hours, so resolve them once
+    short_rest_pairs = []
+    for s_prev in active_shifts:
+        end_prev = _send(s_prev)
+        prev_end_abs = end_prev if end_prev < 24 else end_prev - 24
+        for s_next in active_shifts:
+            if (24 - prev_end_abs) + _sstart(s_next) < min_daily_rest:
+                short_rest_pairs.append((s_prev, s_next))
     for e in Emps:
         for i, d in enumerate(dates[:-1]):
             dn = dates[i + 1]
-            for s_prev in active_shifts:
-                for s_next in active_shifts:
-                    end_prev = _send(s_prev)
-                    start_next = _sstart(s_next)
-                    prev_end_abs = end_prev if end_prev < 24 else end_prev - 24
-                    rest_hours = (24 - prev_end_abs) + start_next
-                    if rest_hours < min_daily_rest:
-                        m += (
-                            pulp.lpSum(x[(e.name, d, s_prev, r)] for r in roles) +
-                            pulp.lpSum(x[(e.name, dn, s_next, r)] for r in roles)
-                            <= 1
-                        )
+            for s_prev, s_next in short_rest_pairs:
+                prev_vs = by_eds.get((e.name, d, s_prev))
+                next_vs = by_eds.get((e.name, dn, s_next))
+                if prev_vs and next_vs:
+                    m += pulp.lpSum(prev_vs) + pulp.lpSum(next_vs) <= 1
 
     # Max consecutive days: in any (K+1)-day sliding window, at most K worked days
     K = max_consecutive_days
@@ -743,13 +805,9 @@ def generate_schedule_opt(
         for i in range(0, len(dates) - K):
             window = dates[i:i + K + 1]
             for e in Emps:
-                m += pulp.lpSum(
-                    pulp.lpSum(
-                        pulp.lpSum(x[(e.name, d, s, r)] for r in roles)
-                        for s in active_shifts
-                    )
-                    for d in window
-                ) <= K
+                worked = [v for d in window for _, v in by_ed.get((e.name, d), ())]
+                if worked:
+                    m += pulp.lpSum(worked) <= K
 
     # Fairness targets per week (simple heuristic)
     T = {}
@@ -764,16 +822,20 @@ def generate_schedule_opt(
     # --- Objective ---
     obj = 0
     obj += W["pen_under"] * pulp.lpSum(u.values()) + W["pen_over"] * pulp.lpSum(o.values())
+    # An extra head must cost more than the most one assignment can earn back through the
+    # preference/priority/fairness terms below, or the solver staffs every slot to the cap
+    for (d, s, r), v in ex.items():
+        max_gain = (W["w_pref"] * (s in role_pref.get(r, []))
+                    + W["w_prio"] * max(0, 10 - role_prio.get(r, 5))
+                    + W["w_fair"] * _slen(s))
+        obj += (W["pen_over"] + max_gain) * v
 
     pref_terms = []
     prio_terms = []
-    for e in Emps:
-        for d in dates:
-            for s in active_shifts:
-                for r in roles:
-                    if s in role_pref.get(r, []):
-                        pref_terms.append(x[(e.name, d, s, r)])
-                    prio_terms.append((10 - role_prio.get(r, 5)) * x[(e.name, d, s, r)])
+    for (_, _, s, r), v in x.items():
+        if s in role_pref.get(r, []):
+            pref_terms.append(v)
+        prio_terms.append((10 - role_prio.get(r, 5)) * v)
 
     if pref_terms:
         obj += -W["w_pref"] * pulp.lpSum(pref_terms)
@@ -784,19 +846,24 @@ def generate_schedule_opt(
     m.setObjective(obj)
 
     # Solve
-    m.solve(pulp.PULP_CBC_CMD(msg=False))
+    m.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=MILP_TIME_LIMIT_S, gapAbs=1.0))
+    # No incumbent (time limit hit first, or infeasible): every value() would be None and
+    # the result would read as an empty schedule with nothing missing
+    if m.sol_status not in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+        raise RuntimeError(f"MILP solver returned no solution (status: {pulp.LpStatus[m.status]})")
 
     # Build schedule + missing
     rows = []
-    missing_rows = []
+    missing_counts: Counter = Counter()  # (day, date, shift, role) -> unfilled slots
     for d in dates:
+        day_name, date_str = DAYS[d.weekday()], d.isoformat()  # once per day, not per row
         for s in active_shifts:
             for r in roles:
-                assigned_names = [e.name for e in Emps if x[(e.name, d, s, r)].value() >= 0.5]
+                assigned_names = [name for name, v in by_dsr.get((d, s, r), ()) if (v.value() or 0) >= 0.5]
                 for name in assigned_names:
                     rows.append({
-                        "Ημέρα": DAYS[d.weekday()],
-                        "Ημερομηνία": str(d),
+                        "Ημέρα": day_name,
+                        "Ημερομηνία": date_str,
                         "Βάρδια": s,
                         "Υπάλληλος": name,
                         "Ρόλος": r,
@@ -804,14 +871,11 @@ def generate_schedule_opt(
                     })
                 under = u[(d, s, r)].value()
                 if under and under > 1e-6:
-                    missing_rows.append({
-                        "Ημέρα": DAYS[d.weekday()],
-                        "Ημερομηνία": str(d),
-                        "Βάρδια": s,
-                        "Ρόλος": r,
-                        "Λείπουν": int(round(under)),
-                    })
+                    missing_counts[(day_name, date_str, s, r)] += int(round(under))
 
     sched_df = pd.DataFrame(rows, columns=["Ημέρα", "Ημερομηνία", "Βάρδια", "Υπάλληλος", "Ρόλος", "Ώρες"])
-    missing_df = pd.DataFrame(missing_rows, columns=["Ημέρα", "Ημερομηνία", "Βάρδια", "Ρόλος", "Λείπουν"])
+    missing_df = pd.DataFrame.from_records(
+        [(*key, n) for key, n in missing_counts.items()],
+        columns=["Ημέρα", "Ημερομηνία", "Βάρδια", "Ρόλος", "Λείπουν"],
+    )
     return sched_df, missing_df
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the SQLite data layer (db.py)
+"""
+
+import datetime as dt
+import threading
+
+import pytest
+
+import db
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point db.py at a fresh database file for each test"""
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "test.db"))
+    db.init_db()
+    yield
+    db.close_conn()
+
+
+@pytest.fixture
+def company_id(temp_db):
+    db.create_company("Test Co")
+    return db.get_all_companies()[0]["id"]
+
+
+# ============================================================================
+# CONNECTION POOL
+# ============================================================================
+
+class TestConnectionPool:
+    """Per-thread connection reuse"""
+
+    def test_same_thread_reuses_connection(self, temp_db):
+        with db.get_conn() as a:
+            pass
+        with db.get_conn() as b:
+            pass
+        assert a is b
+
+    def test_other_thread_gets_own_connection(self, temp_db):
+        with db.get_conn() as main_conn:
+            pass
+        seen = []
+
+        def worker():
+            with db.get_conn() as c:
+                seen.append(c)
+            db.close_conn()
+
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+        assert seen and seen[0] is not main_conn
+
+    def test_exit_hook_closes_other_threads_connections(self, temp_db):
+        seen = []
+
+        def worker():
+            with db.get_conn() as c:
+                seen.append(c)
+
+        t = threading.Thread(target=worker)  # never calls close_conn itself
+        t.start()
+        t.join()
+        db._close_all_conns()
+        with pytest.raises(db.sqlite3.ProgrammingError):
+            seen[0].execute("SELECT 1")
+
+    def test_error_rolls_back(self, company_id):
+        with pytest.raises(RuntimeError):
+            with db.get_conn() as conn:
+                conn.execute("INSERT INTO companies (name) VALUES ('Rolled Back')")
+                raise RuntimeError("boom")
+        names = [c["name"] for c in db.get_all_companies()]
+        assert names == ["Test Co"]
+
+    def test_read_conn_is_separate_and_read_only(self, company_id):
+        with db.get_conn() as writer:
+            pass
+        with db.get_read_conn() as reader:
+            assert reader is not writer
+            assert reader.execute("SELECT COUNT(*) FROM companies").fetchone()[0] == 1
+            with pytest.raises(db.sqlite3.OperationalError):
+                reader.execute("DELETE FROM companies")
+
+    def test_concurrent_writers_do_not_hit_busy(self, company_id):
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(10):
+                    db.add_employee(company_id, f"W{n}-{i}", [], [])
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+            finally:
+                db.close_conn()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors
+        assert len(db.get_employees(company_id)) == 40
+
+    def test_pragmas_applied(self, temp_db):
+        with db.get_conn() as conn:
+            assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_close_refreshes_planner_stats(self, company_id):
+        db.add_employee(company_id, "Maria", [], [])
+        emp_id = db.get_employees(company_id)[0]["id"]
+        week = [{"employee_id": emp_id, "date": f"2024-01-0{d}", "shift": "Πρωί"} for d in range(1, 8)]
+        db.bulk_save_week_schedule(company_id, week, "2024-01-01", "2024-01-07")
+        db.get_schedule_range(company_id, "2024-01-01", "2024-01-07")
+        db.close_conn()
+        with db.get_read_conn() as conn:
+            analyzed = {r[0] for r in conn.execute("SELECT tbl FROM sqlite_stat1")}
+        assert "schedule" in analyzed
+
+    def test_writer_refreshes_planner_stats_periodically(self, company_id, monkeypatch):
+        monkeypatch.setattr(db, "_OPTIMIZE_INTERVAL_S", 0.0)
+        db.add_employee(company_id, "Maria", [], [])
+        emp_id = db.get_employees(company_id)[0]["id"]
+        week = [{"employee_id": emp_id, "date": f"2024-01-0{d}", "shift": "Πρωί"} for d in range(1, 8)]
+        for _ in range(2):
+            db.bulk_save_week_schedule(company_id, week, "2024-01-01", "2024-01-07")
+        with db.get_read_conn() as conn:  # writer still open: no close_conn() here
+            analyzed = {r[0] for r in conn.execute("SELECT tbl FROM sqlite_stat1")}
+        assert "schedule" in analyzed
+
+
+class TestInitDb:
+    """Schema setup and version gating"""
+
+    def test_sets_schema_version(self, temp_db):
+        with db.get_read_conn() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+
+    def test_skips_when_schema_current(self, temp_db):
+        with db.get_conn() as conn:
+            conn.execute("DROP INDEX idx_sched_company_date_cov")
+        db.init_db()
+        with db.get_conn() as conn:
+            assert "idx_sched_company_date_cov" not in db._existing_objects(conn, "index")
+
+    def test_migrates_older_schema(self, temp_db):
+        with db.get_conn() as conn:
+            conn.execute("PRAGMA user_version = 0")
+            conn.execute("DROP INDEX idx_sched_company_date_cov")
+        db.init_db()
+        with db.get_conn() as conn:
+            assert "idx_sched_company_date_cov" in db._existing_objects(conn, "index")
+
+    def test_schedule_range_uses_covering_index(self, temp_db):
+        with db.get_read_conn() as conn:
+            plan = " ".join(r[-1] for r in conn.execute(
+                "EXPLAIN QUERY PLAN " + db._SQL_SCHEDULE_RANGE, (1, "2024-01-01", "2024-01-07")))
+        assert "COVERING INDEX idx_sched_company_date_cov" in plan
+
+
+# ============================================================================
+# CRUD
+# ============================================================================
+
+class TestCrud:
+    """Round trips through the public helpers"""
+
+    def test_employee_and_schedule_round_trip(self, company_id):
+        db.add_employee(company_id, "Maria", "Ταμείο", ["Πρωί"])
+        emp = db.get_employees(company_id)[0]
+        assert emp["roles"] == ["Ταμείο"] and emp["role"] == "Ταμείο"
+
+        db.add_schedule_entry(company_id, emp["id"], "2024-01-01", "Πρωί", "Ταμείο")
+        db.add_schedule_entry(company_id, emp["id"], "2024-01-01", "Πρωί", "Barista")  # upsert
+        rows = db.get_schedule_range(company_id, "2024-01-01", "2024-01-07")
+        assert len(rows) == 1 and rows[0]["role"] == "Barista"
+
+    def test_bulk_save_applies_only_the_difference(self, company_id):
+        db.add_employee(company_id, "Maria", ["Ταμείο"], [])
+        db.add_employee(company_id, "Nikos", ["Barista"], [])
+        maria, nikos = (e["id"] for e in db.get_employees(company_id))
+        week = [
+            {"employee_id": maria, "date": "2024-01-01", "shift": "Πρωί", "role": "Ταμείο"},
+            {"employee_id": nikos, "date": "2024-01-01", "shift": "Βράδυ", "role": "Barista"},
+            {"employee_id": maria, "date": "2024-01-02", "shift": "Πρωί", "role": "Ταμείο"},
+        ]
+        db.bulk_save_week_schedule(company_id, week, "2024-01-01", "2024-01-07")
+        before = {(r["employee_id"], r["date"], r["shift"]): r["id"]
+                  for r in db.get_schedule_range(company_id, "2024-01-01", "2024-01-07")}
+
+        resaved = [dict(week[0]), dict(week[1], role="Ταμείο")]  # drop the 3rd, change a role
+        db.bulk_save_week_schedule(company_id, resaved, "2024-01-01", "2024-01-07")
+        after = db.get_schedule_range(company_id, "2024-01-01", "2024-01-07")
+
+        assert {(r["employee_id"], r["date"], r["shift"]): r["role"] for r in after} == {
+            (maria, "2024-01-01", "Πρωί"): "Ταμείο",
+            (nikos, "2024-01-01", "Βράδυ"): "Ταμείο",
+        }
+        # Unchanged rows are kept in place rather than deleted and re-inserted
+        assert all(r["id"] == before[(r["employee_id"], r["date"], r["shift"])] for r in after)
+
+    def test_bulk_save_spans_several_insert_batches(self, company_id):
+        db.add_employee(company_id, "Maria", ["Ταμείο"], [])
+        emp_id = db.get_employees(company_id)[0]["id"]
+        start = dt.date(2024, 1, 1)
+        days = [(start + dt.timedelta(days=i)).isoformat() for i in range(70)]
+        rows = [{"employee_id": emp_id, "date": d, "shift": s} for d in days for s in ("Πρωί", "Απόγευμα", "Βράδυ")]
+        assert len(rows) > db._STAGE_BATCH_ROWS
+        db.bulk_save_week_schedule(company_id, rows, days[0], days[-1])
+        assert len(db.get_schedule_range(company_id, days[0], days[-1])) == len(rows)
+
+    def test_cached_roles_are_not_shared_between_rows(self, company_id):
+        db.add_employee(company_id, "Maria", ["Ταμείο"], [])
+        emp_id = db.get_employees(company_id)[0]["id"]
+        db.add_schedule_entry(company_id, emp_id, "2024-01-01", "Πρωί")
+        db.add_schedule_entry(company_id, emp_id, "2024-01-02", "Πρωί")
+        first, second = db.get_schedule_range(company_id, "2024-01-01", "2024-01-07")
+        first["roles"].append("Barista")
+        assert second["roles"] == ["Ταμείο"]
+        assert db.get_employees(company_id)[0]["roles"] == ["Ταμείο"]
+
+    def test_iter_schedule_range_streams_in_batches(self, company_id, monkeypatch):
+        db.add_employee(company_id, "Maria", ["Ταμείο"], [])
+        emp_id = db.get_employees(company_id)[0]["id"]
+        for day in range(1, 8):
+            db.add_schedule_entry(company_id, emp_id, f"2024-01-0{day}", "Πρωί")
+        expected = db.get_schedule_range(company_id, "2024-01-01", "2024-01-07")
+
+        iter_dicts = db._iter_dicts
+        monkeypatch.setattr(db, "_iter_dicts", lambda *a: iter_dicts(*a, size=3))
+        assert list(db.iter_schedule_range(company_id, "2024-01-01", "2024-01-07")) == expected
+        assert len(expected) == 7
+
+    def test_employee_id_map_matches_by_name_lookup(self, company_id):
+        for name in ("Maria", "Nikos", "Maria"):
+            db.add_employee(company_id, name, [], [])
+        ids = db.get_employee_id_map(company_id)
+        assert ids == {n: db.get_employee_id_by_name(company_id, n) for n in ("Maria", "Nikos")}
+        assert ids["Maria"] == min(e["id"] for e in db.get_employees(company_id) if e["name"] == "Maria")
+
+    def test_company_fields_subset_matches_full_load(self, company_id):
+        db.update_company(company_id, {"name": "Test Co", "active_shifts": ["Πρωί"], "rules": {"min_daily_rest": 12}})
+        full = db.get_company(company_id)
+        subset = db.get_company_fields(company_id, fields=("active_shifts", "rules"))
+        assert subset == {"active_shifts": full["active_shifts"], "rules": full["rules"]}
+        assert db.get_company_fields(company_id + 1, fields=("id",)) is None
+        with pytest.raises(ValueError):
+            db.get_company_fields(company_id, fields=("id, name",))
+
+    def test_update_company_only_writes_given_fields(self, company_id):
+        db.update_company(company_id, {"roles": ["Ταμείο"], "role_settings": {"Ταμείο": {"min_per_shift": 2}}})
+        db.update_company(company_id, {"active": 0})
+        company = db.get_company(company_id)
+        assert company["active"] == 0 and company["name"] == "Test Co"
+        assert company["roles"] == ["Ταμείο"]
+        assert company["role_settings"] == {"Ταμείο": {"min_per_shift": 2}}
+        with pytest.raises(ValueError):
+            db.update_company(company_id, {"name": "  "})
+
+    def test_schedule_entry_rejects_foreign_employee(self, company_id):
+        db.create_company("Other Co")
+        other = [c for c in db.get_all_companies() if c["name"] == "Other Co"][0]["id"]
+        db.add_employee(other, "Nikos", [], [])
+        emp_id = db.get_employees(other)[0]["id"]
+        with pytest.raises(ValueError):
+            db.add_schedule_entry(company_id, emp_id, "2024-01-01", "Πρωί")
+
+
+class TestSwaps:
+    """Approving swap requests"""
+
+    def _two_on_same_slot(self, company_id):
+        db.add_employee(company_id, "Anna", ["Ταμείο"], ["Πρωί"])
+        db.add_employee(company_id, "Babis", ["Barista"], ["Πρωί"])
+        anna, babis = (e["id"] for e in db.get_employees(company_id))
+        db.add_schedule_entry(company_id, anna, "2024-01-01", "Πρωί", "Ταμείο")
+        db.add_schedule_entry(company_id, babis, "2024-01-01", "Πρωί", "Barista")
+        return anna, babis
+
+    def test_swap_when_both_hold_slot_exchanges_roles(self, company_id):
+        anna, babis = self._two_on_same_slot(company_id)
+        db.create_swap_request(company_id, anna, babis, "2024-01-01", "Πρωί")
+        req = db.list_swap_requests(company_id, "pending")[0]
+
+        db.apply_approved_swap(company_id, "2024-01-01", "Πρωί", anna, babis,
+                               request_id=req["id"], manager_note="ok")
+
+        roles = {r["employee_id"]: r["role"] for r in db.get_schedule_range(company_id, "2024-01-01", "2024-01-01")}
+        assert roles == {anna: "Barista", babis: "Ταμείο"}
+        approved = db.list_swap_requests(company_id, "approved")
+        assert [(r["id"], r["manager_note"]) for r in approved] == [(req["id"], "ok")]
+
+    def test_swap_moves_slot_to_target(self, company_id):
+        db.add_employee(company_id, "Anna", ["Ταμείο"], ["Πρωί"])
+        db.add_employee(company_id, "Babis", ["Ταμείο"], ["Πρωί"])
+        anna, babis = (e["id"] for e in db.get_employees(company_id))
+        db.add_schedule_entry(company_id, anna, "2024-01-01", "Πρωί", "Ταμείο")
+
+        db.apply_approved_swap(company_id, "2024-01-01", "Πρωί", anna, babis)
+
+        rows = db.get_schedule_range(company_id, "2024-01-01", "2024-01-01")
+        assert [(r["employee_id"], r["role"]) for r in rows] == [(babis, "Ταμείο")]
+
+    def test_list_swap_requests_pages_in_id_order(self, company_id):
+        anna, babis = self._two_on_same_slot(company_id)
+        for day in ("2024-01-02", "2024-01-03", "2024-01-04"):
+            db.add_schedule_entry(company_id, anna, day, "Πρωί", "Ταμείο")
+            db.create_swap_request(company_id, anna, babis, day, "Πρωί")
+
+        first = db.list_swap_requests(company_id, "pending", limit=2)
+        rest = db.list_swap_requests(company_id, "pending", limit=2, offset=2)
+
+        assert [r["date"] for r in first + rest] == ["2024-01-02", "2024-01-03", "2024-01-04"]
+
+    def test_create_swap_requests_is_all_or_nothing(self, company_id):
+        anna, babis = self._two_on_same_slot(company_id)
+        db.add_schedule_entry(company_id, anna, "2024-01-02", "Πρωί", "Ταμείο")
+        ok = {"requester_id": anna, "target_employee_id": babis, "date": "2024-01-01", "shift": "Πρωί"}
+
+        with pytest.raises(ValueError):
+            db.create_swap_requests(company_id, [ok, dict(ok, date="2024-01-09")])
+        assert db.list_swap_requests(company_id) == []
+
+        ids = db.create_swap_requests(company_id, [ok, dict(ok, date="2024-01-02")])
+        assert [r["id"] for r in db.list_swap_requests(company_id, limit=10)] == ids
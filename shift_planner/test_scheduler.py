@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the rule-based schedulers (scheduler.py)
+"""
+
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("pulp")
+
+import pulp
+
+import scheduler
+from scheduler import generate_schedule_opt, generate_schedule_smart
+
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+SHIFTS = ["Πρωί", "Απόγευμα"]
+ROLES = ["Ταμείο", "Barista"]
+
+
+@pytest.fixture
+def employees():
+    """Enough staff to cover every slot several times over"""
+    return [
+        {"name": f"E{i}", "roles": list(ROLES), "availability": list(SHIFTS)}
+        for i in range(8)
+    ]
+
+
+def _counts(df):
+    return Counter(zip(df["Ημερομηνία"], df["Βάρδια"], df["Ρόλος"]))
+
+
+# ============================================================================
+# MILP COVERAGE
+# ============================================================================
+
+class TestOptCoverage:
+    """generate_schedule_opt staffs to the minimum, not up to the cap"""
+
+    @pytest.mark.parametrize("max_per_shift", [5, None])
+    def test_staffs_each_slot_to_the_minimum(self, employees, max_per_shift):
+        settings = {r: {"min_per_shift": 1, "priority": 1, "preferred_shifts": ["Πρωί"]} for r in ROLES}
+        if max_per_shift is not None:
+            for r in ROLES:
+                settings[r]["max_per_shift"] = max_per_shift
+
+        sched, missing = generate_schedule_opt(
+            "2024-01-01", employees, SHIFTS, ROLES, {}, settings, days_count=4, work_model="7ήμερο"
+        )
+
+        counts = _counts(sched)
+        assert len(counts) == 4 * len(SHIFTS) * len(ROLES)
+        assert set(counts.values()) == {1}
+        assert missing.empty
+
+    def test_reports_shortfall_when_understaffed(self):
+        one = [{"name": "Solo", "roles": ["Ταμείο"], "availability": ["Πρωί"]}]
+        settings = {"Ταμείο": {"min_per_shift": 2}}
+
+        sched, missing = generate_schedule_opt(
+            "2024-01-01", one, ["Πρωί"], ["Ταμείο"], {}, settings, days_count=3, work_model="7ήμερο"
+        )
+
+        assert all(n <= 1 for n in _counts(sched).values())
+        assert missing["Λείπουν"].sum() == 2 * 3 - len(sched)
+
+    def test_raises_when_solver_finds_no_solution(self, employees, monkeypatch):
+        monkeypatch.setattr(pulp.LpProblem, "solve", lambda self, *a, **k: None)  # leaves sol_status unset
+        with pytest.raises(RuntimeError):
+            generate_schedule_opt(
+                "2024-01-01", employees, SHIFTS, ROLES, {}, {}, days_count=2, work_model="7ήμερο"
+            )
+
+
+# ============================================================================
+# SMART DISPATCH
+# ============================================================================
+
+class TestSmart:
+    """generate_schedule_smart only pays for the MILP when greedy falls short"""
+
+    def test_fully_covered_greedy_skips_milp(self, employees, monkeypatch):
+        def _no_milp(*a, **k):
+            raise AssertionError("MILP should not run")
+        monkeypatch.setattr(scheduler, "generate_schedule_opt", _no_milp)
+
+        sched, missing = generate_schedule_smart(
+            "2024-01-01", employees, SHIFTS, ROLES, {}, {}, days_count=30, work_model="5ήμερο"
+        )
+        assert missing.empty and not sched.empty
+
+    def test_falls_back_to_greedy_when_milp_fails(self, monkeypatch):
+        one = [{"name": "Solo", "roles": ["Ταμείο"], "availability": ["Πρωί"]}]
+        settings = {"Ταμείο": {"min_per_shift": 2}}
+        monkeypatch.setattr(pulp.LpProblem, "solve", lambda self, *a, **k: None)
+
+        sched, missing = generate_schedule_smart(
+            "2024-01-01", one, ["Πρωί"], ["Ταμείο"], {}, settings, days_count=3, work_model="7ήμερο"
+        )
+        assert len(sched) == 3
+        assert missing["Λείπουν"].sum() == 3
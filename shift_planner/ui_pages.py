@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
+import json
 import streamlit as st
 import pandas as pd
 import datetime as dt
+import functools
 from datetime import date as dt_date, timedelta
 
 from typing import Optional
@@ -9,11 +11,11 @@ from db import (
     get_all_companies, get_company, update_company, create_company,
     get_employees, add_employee, update_employee, delete_employee,
     # Visual builder + swaps:
-    get_schedule_range, bulk_save_week_schedule, get_employee_id_by_name,
+    get_schedule_range, bulk_save_week_schedule, get_employee_id_map,
     create_swap_request, list_swap_requests, update_swap_status, apply_approved_swap,
 )
 
-from constants import DAYS, SHIFT_TIMES, ALL_SHIFTS, DEFAULT_ROLES, DEFAULT_RULES
+from constants import DAYS, SHIFT_TIMES, ALL_SHIFTS, DEFAULT_ROLES, DEFAULT_RULES, shift_hours as _shift_len
 
 # Import new analytics and export modules
 try:
@@ -36,9 +38,57 @@ try:
 except Exception:  # ImportError or AttributeError
     _auto_fix_schedule = None
 
+# --- Optional import: rule-enforcing solver (MILP with greedy fallback) ---
+try:
+    from scheduler import generate_schedule_smart as _solve_schedule
+except Exception:  # ImportError or AttributeError
+    _solve_schedule = None
+
 from scheduler import check_violations
 
 
+_SETTINGS_FIELDS = ("name", "active_shifts", "roles", "rules", "role_settings", "work_model", "active")
+
+
+def _settings_snapshot(company: dict) -> str:
+    """Canonical JSON of the persisted company settings (used to detect unsaved edits)."""
+    return json.dumps({k: company.get(k) for k in _SETTINGS_FIELDS},
+                      ensure_ascii=False, sort_keys=True, default=str)
+
+
+# Company setting defaults as factories: only the missing keys get a fresh copy, instead of
+# setdefault() building every default list/dict on each rerun just to throw it away.
+_COMPANY_DEFAULTS = (
+    ("active_shifts", lambda: list(ALL_SHIFTS)),
+    ("roles", lambda: list(DEFAULT_ROLES)),
+    ("rules", DEFAULT_RULES.copy),
+    ("role_settings", dict),
+    ("work_model", lambda: "5ήμερο"),
+)
+
+# Editable rules with their (min, max) input bounds; defaults come from DEFAULT_RULES,
+# so each rerun only reads the company's current values.
+_RULE_BOUNDS = (
+    ("max_daily_hours_5days", 6, 12),
+    ("max_daily_hours_6days", 6, 12),
+    ("max_daily_hours_7days", 6, 12),
+    ("max_daily_overtime",    0, 6),
+    ("min_daily_rest",        8, 24),
+    ("weekly_hours_5days",    30, 50),
+    ("weekly_hours_6days",    30, 60),
+    ("weekly_hours_7days",    35, 70),
+    ("monthly_hours",         100, 300),
+    ("max_consecutive_days",  3, 10),
+)
+
+
+def _ensure_company_defaults(company: dict) -> dict:
+    for key, make in _COMPANY_DEFAULTS:
+        if key not in company:
+            company[key] = make()
+    return company
+
+
 def page_business():
     st.title("⚙️ Business Configuration")
     st.caption("Configure your business settings, shifts, roles, and scheduling rules")
@@ -48,14 +98,14 @@ def page_business():
         st.warning("⚠️ Please select a company from the sidebar.")
         return
 
-    company = st.session_state.company
-    company.setdefault("active_shifts", ALL_SHIFTS.copy())
-    company.setdefault("roles", DEFAULT_ROLES.copy())
-    company.setdefault("rules", DEFAULT_RULES.copy())
-    company.setdefault("role_settings", {})
-    company.setdefault("work_model", "5ήμερο")
+    company = _ensure_company_defaults(st.session_state.company)
     company.setdefault("active", True)
 
+    # Snapshot of what is stored, taken once per opened company (not on every rerun)
+    saved = st.session_state.get("_company_saved")
+    if not saved or saved[0] != company.get("id"):
+        st.session_state["_company_saved"] = (company.get("id"), _settings_snapshot(company))
+
     # Basic Settings in clean card
     with st.container():
         st.subheader("🏢 Basic Information")
@@ -93,7 +143,7 @@ def page_business():
                     st.rerun()
         
         if st.button("↩️ Reset to Defaults", type="secondary"):
-            company["active_shifts"] = ALL_SHIFTS.copy()
+            company["active_shifts"] = list(ALL_SHIFTS)
             st.rerun()
         
         st.write("**Active Shifts:**")
@@ -124,56 +174,54 @@ def page_business():
         
         if company.get("roles"):
             st.write("")
-            for r in company.get("roles", []):
-                rs = company["role_settings"].setdefault(r, {})
-                rs["priority"]        = int(rs.get("priority", 5))
-                rs["min_per_shift"]   = int(rs.get("min_per_shift", 1))
-                rs["max_per_shift"]   = int(rs.get("max_per_shift", 5))
-                rs["max_hours_week"]  = int(rs.get("max_hours_week", 40))
-                rs["cost"]            = float(rs.get("cost", 0.0))
-                rs.setdefault("preferred_shifts", [])
-
-                with st.container():
-                    st.markdown(f"**{r}**")
-                    col = st.columns([1, 1, 1])
-                    rs["priority"]       = col[0].slider("Priority", 1, 10, rs["priority"], key=f"prio_{r}")
-                    rs["min_per_shift"]  = col[1].number_input("Min", 0, 10, rs["min_per_shift"], key=f"min_{r}")
-                    rs["max_per_shift"]  = col[2].number_input("Max", 1, 10, rs["max_per_shift"], key=f"max_{r}")
+            # Batch edits in a form: widgets inside it do not trigger a rerun per change
+            with st.form("role_settings_form"):
+                for r in company.get("roles", []):
+                    rs = company["role_settings"].setdefault(r, {})
+                    rs["priority"]        = int(rs.get("priority", 5))
+                    rs["min_per_shift"]   = int(rs.get("min_per_shift", 1))
+                    rs["max_per_shift"]   = int(rs.get("max_per_shift", 5))
+                    rs["max_hours_week"]  = int(rs.get("max_hours_week", 40))
+                    rs["cost"]            = float(rs.get("cost", 0.0))
+                    rs.setdefault("preferred_shifts", [])
+
+                    with st.container():
+                        st.markdown(f"**{r}**")
+                        col = st.columns([1, 1, 1])
+                        rs["priority"]       = col[0].slider("Priority", 1, 10, rs["priority"], key=f"prio_{r}")
+                        rs["min_per_shift"]  = col[1].number_input("Min", 0, 10, rs["min_per_shift"], key=f"min_{r}")
+                        rs["max_per_shift"]  = col[2].number_input("Max", 1, 10, rs["max_per_shift"], key=f"max_{r}")
                     
-                    rs["preferred_shifts"] = st.multiselect(
-                        "Preferred Shifts",
-                        company.get("active_shifts", []),
-                        default=rs.get("preferred_shifts", []),
-                        key=f"pref_{r}"
-                    )
-                    st.divider()
+                        rs["preferred_shifts"] = st.multiselect(
+                            "Preferred Shifts",
+                            company.get("active_shifts", []),
+                            default=rs.get("preferred_shifts", []),
+                            key=f"pref_{r}"
+                        )
+                        st.divider()
+                st.form_submit_button("✔️ Εφαρμογή ρόλων")
 
     # -------- Κανόνες --------
     with st.expander("⚖️ Κανόνες", expanded=False):
         rules = company.get("rules", {})
-        rule_defs = {
-            "max_daily_hours_5days": (6, 12, rules.get("max_daily_hours_5days", 8)),
-            "max_daily_hours_6days": (6, 12, rules.get("max_daily_hours_6days", 9)),
-            "max_daily_hours_7days": (6, 12, rules.get("max_daily_hours_7days", 9)),
-            "max_daily_overtime":    (0, 6,  rules.get("max_daily_overtime", 3)),
-            "min_daily_rest":        (8, 24, rules.get("min_daily_rest", 11)),
-            "weekly_hours_5days":    (30, 50, rules.get("weekly_hours_5days", 40)),
-            "weekly_hours_6days":    (30, 60, rules.get("weekly_hours_6days", 48)),
-            "weekly_hours_7days":    (35, 70, rules.get("weekly_hours_7days", 56)),
-            "monthly_hours":         (100, 300, rules.get("monthly_hours", 160)),
-            "max_consecutive_days":  (3, 10, rules.get("max_consecutive_days", 6)),
-        }
-        for k, (mn, mx, dv) in rule_defs.items():
-            rules[k] = st.number_input(k, mn, mx, dv)
+        with st.form("rules_form"):
+            for k, mn, mx in _RULE_BOUNDS:
+                rules[k] = st.number_input(k, mn, mx, rules.get(k, DEFAULT_RULES[k]))
+            st.form_submit_button("✔️ Εφαρμογή κανόνων")
         company["rules"] = rules
 
     # -------- Save --------
     if st.button("💾 Αποθήκευση Ρυθμίσεων", type="primary"):
-        try:
-            update_company(company["id"], company)
-            st.success("✅ Αποθηκεύτηκε")
-        except Exception as ex:
-            st.error(f"Αποτυχία: {ex}")
+        snapshot = _settings_snapshot(company)
+        if snapshot == st.session_state["_company_saved"][1]:
+            st.info("Δεν υπάρχουν αλλαγές για αποθήκευση.")
+        else:
+            try:
+                update_company(company["id"], company)
+                st.session_state["_company_saved"] = (company.get("id"), snapshot)
+                st.success("✅ Αποθηκεύτηκε")
+            except Exception as ex:
+                st.error(f"Αποτυχία: {ex}")
 
 
 # ------------------------- Helpers ------------------------- #
@@ -318,10 +366,6 @@ def _sanitize_default(options: list[str], default_vals: list[str]):
     missing = [v for v in default_vals if v not in opts]
     return valid, missing
 
-def _shift_len(shift: str) -> int:
-    s, e = SHIFT_TIMES.get(shift, (9, 17))
-    return (24 - s + e) if e < s else (e - s)
-
 def _ensure_schedule_df(df: pd.DataFrame | None) -> pd.DataFrame:
     cols = ["Ημέρα", "Ημερομηνία", "Βάρδια", "Υπάλληλος", "Ρόλος", "Ώρες"]
     if df is None or df.empty:
@@ -369,41 +413,52 @@ def generate_schedule(start_date, employees, active_shifts, roles, rules, role_s
         return empty, pd.DataFrame(columns=["Ημέρα", "Ημερομηνία", "Βάρδια", "Ρόλος", "Λείπουν"])
 
     start_date = pd.to_datetime(start_date).date()
-    rows, missing = [], []
+    # Accumulate column lists and build each DataFrame once at the end
+    cols = {c: [] for c in ("Ημέρα", "Ημερομηνία", "Βάρδια", "Υπάλληλος", "Ρόλος", "Ώρες")}
+    miss = {c: [] for c in ("Ημέρα", "Ημερομηνία", "Βάρδια", "Ρόλος", "Λείπουν")}
     min_per = {r: max(0, int(role_settings.get(r, {}).get("min_per_shift", 1))) for r in roles}
 
     idx = 0
     order = list(employees)
 
-    for d in range(days_count):
-        day_dt = start_date + dt.timedelta(days=d)
-        weekday_name = DAYS[day_dt.weekday()]
+    # Eligibility is fixed for the whole run: encode each employee's availability as a
+    # bitmask over active_shifts and pre-sort their usable roles (lower priority value first)
+    shift_bit = {s: 1 << i for i, s in enumerate(active_shifts)}
+    avail_mask = [
+        sum(shift_bit[s] for s in set(_availability_list(emp)) if s in shift_bit) for emp in order
+    ]
+    role_order = [
+        [r for r in sorted(_employee_roles(emp), key=lambda x: role_settings.get(x, {}).get("priority", 5))
+         if r in roles]
+        for emp in order
+    ]
+    names = [emp.get("name", "") for emp in order]
+    hours = {s: float(_shift_len(s)) for s in active_shifts}
+
+    # Day labels for the whole period in one vectorized pass
+    period = pd.date_range(start_date, periods=days_count, freq="D")
+    day_labels = list(zip((DAYS[w] for w in period.weekday), period.strftime("%Y-%m-%d")))
+
+    for weekday_name, date_str in day_labels:
         for shift in active_shifts:
             need = dict(min_per)  # copy per shift
+            bit = shift_bit[shift]
             for _ in range(len(order)):
-                emp = order[idx % len(order)]
+                i = idx % len(order)
                 idx += 1
-                avail_list = _availability_list(emp)
-                if shift not in avail_list:
-                    continue
-                eroles = _employee_roles(emp)
-                if not eroles:
+                if not avail_mask[i] & bit or not role_order[i]:
                     continue
 
                 # Try by role priority (lower value = higher priority)
                 placed = False
-                for r in sorted(eroles, key=lambda x: role_settings.get(x, {}).get("priority", 5)):
-                    if r not in roles:
-                        continue
+                for r in role_order[i]:
                     if need.get(r, 0) > 0:
-                        rows.append({
-                            "Ημέρα": weekday_name,
-                            "Ημερομηνία": str(day_dt),
-                            "Βάρδια": shift,
-                            "Υπάλληλος": emp.get("name", ""),
-                            "Ρόλος": r,
-                            "Ώρες": float(_shift_len(shift)),
-                        })
+                        cols["Ημέρα"].append(weekday_name)
+                        cols["Ημερομηνία"].append(date_str)
+                        cols["Βάρδια"].append(shift)
+                        cols["Υπάλληλος"].append(names[i])
+                        cols["Ρόλος"].append(r)
+                        cols["Ώρες"].append(hours[shift])
                         need[r] -= 1
                         placed = True
                         break
@@ -413,19 +468,39 @@ def generate_schedule(start_date, employees, active_shifts, roles, rules, role_s
             # Record any gaps left for this (date, shift)
             for r_name, left in need.items():
                 if left > 0:
-                    missing.append({
-                        "Ημέρα": weekday_name,
-                        "Ημερομηνία": str(day_dt),
-                        "Βάρδια": shift,
-                        "Ρόλος": r_name,
-                        "Λείπουν": left,
-                    })
-
-    df = pd.DataFrame(rows, columns=["Ημέρα", "Ημερομηνία", "Βάρδια", "Υπάλληλος", "Ρόλος", "Ώρες"])
-    missing_df = pd.DataFrame(missing, columns=["Ημέρα", "Ημερομηνία", "Βάρδια", "Ρόλος", "Λείπουν"])
+                    miss["Ημέρα"].append(weekday_name)
+                    miss["Ημερομηνία"].append(date_str)
+                    miss["Βάρδια"].append(shift)
+                    miss["Ρόλος"].append(r_name)
+                    miss["Λείπουν"].append(left)
+
+    df = pd.DataFrame(cols)
+    missing_df = pd.DataFrame(miss)
     return _ensure_schedule_df(df), missing_df
 
 
+@st.cache_data(show_spinner=False)
+def _cached_generate_schedule(start_date, emps_json: str, settings_json: str, days_count: int):
+    """
+    Schedule generation memoized on (period, employees, settings) JSON; repeat clicks become a cache hit.
+    Uses the constraint solver when available (enforces rest/consecutive/weekly rules),
+    otherwise the local round-robin generator.
+    """
+    s = json.loads(settings_json)
+    args = (
+        start_date, json.loads(emps_json),
+        s.get("active_shifts") or [], s.get("roles") or [], s.get("rules") or {},
+        s.get("role_settings") or {}, days_count,
+    )
+    if callable(_solve_schedule):
+        try:
+            df, missing_df = _solve_schedule(*args, work_model=s.get("work_model") or "5ήμερο")
+            return _ensure_schedule_df(df), missing_df
+        except Exception as e:
+            print(f"Solver scheduling failed; using round-robin generator: {e}")
+    return generate_schedule(*args)
+
+
 def _empty_state(header: str, lines: list[str], demo_button: bool = False, on_demo=None):
     st.subheader(header)
     for line in lines:
@@ -482,7 +557,9 @@ def _week_dates(start_date: dt.date, days=7):
 def _column_key(date: dt.date, shift: str) -> str:
     return f"{date.isoformat()}__{shift}"
 
+@functools.lru_cache(maxsize=4096)
 def _parse_column_key(k: str):
+    # Grid columns repeat on every employee row: parse each key once
     d, s = k.split("__", 1)
     return dt.date.fromisoformat(d), s
 
@@ -529,13 +606,18 @@ def _grid_from_db_week(company_id: int, employees: list[dict], start_date: dt.da
         if c != "Υπάλληλος":
             df[c] = "— (καμία)"
 
-    # Overlay existing assignments from DB; show explicit placeholder for "assigned without role"
+    # Overlay existing assignments from DB; show explicit placeholder for "assigned without role".
+    # Resolve the target row through a name -> labels map instead of a full boolean mask per assignment.
+    rows_by_name: dict[str, list] = {}
+    for label, nm in df["Υπάλληλος"].items():
+        rows_by_name.setdefault(nm, []).append(label)
     existing = get_schedule_range(company_id, dates[0].isoformat(), dates[-1].isoformat())
     for row in existing:
         key = _column_key(dt.date.fromisoformat(row["date"]), row["shift"])
         value = row.get("role") if row.get("role") else "— (χωρίς ρόλο)"
         if key in df.columns:
-            df.loc[df["Υπάλληλος"] == row["employee_name"], key] = value
+            for label in rows_by_name.get(row["employee_name"], ()):
+                df.at[label, key] = value
     return df
 
 
@@ -581,12 +663,9 @@ def page_select_company():
         company_id = options[selected_label]
         st.session_state.company = get_company(company_id) or {}
         # safe defaults
-        st.session_state.company.setdefault("active_shifts", ALL_SHIFTS.copy())
-        st.session_state.company.setdefault("roles", DEFAULT_ROLES.copy())
-        st.session_state.company.setdefault("rules", DEFAULT_RULES.copy())
-        st.session_state.company.setdefault("role_settings", {})
-        st.session_state.company.setdefault("work_model", "5ήμερο")
+        _ensure_company_defaults(st.session_state.company)
         st.session_state.employees = get_employees(company_id)
+        st.session_state.pop("_company_saved", None)
         st.rerun()
 
     with st.expander("Δεν βλέπεις εταιρεία;"):
@@ -597,14 +676,119 @@ def page_select_company():
                 st.rerun()
 
 
+@st.fragment
+def _render_week_builder(company: dict, emps: list, dates: list, mode: str):
+    """Weekly grid editor. As a fragment, grid edits rerun only this block, not the whole page."""
+    # ====== Weekly Visual Builder ======
+    st.divider()
+    st.markdown("#### 🧱 Visual builder (εβδομαδιαίος πίνακας)")
+
+    active_shifts = company.get("active_shifts", [])
+
+    # Build initial grid from DB using unified helpers (#17)
+    grid_df = _grid_from_db_week(company["id"], emps, dates[0])
+
+    # Column labels for nicer headers
+    day_heads = {d: f"{DAYS[d.weekday()]} {d.strftime('%d/%m')}" for d in dates}
+    col_labels = { _column_key(d, s): f"{day_heads[d]} • {s}"
+                   for d in dates for s in active_shifts }
+
+    role_choices = ["— (καμία)", "— (χωρίς ρόλο)"] + company.get("roles", [])
+    colcfg = {k: st.column_config.SelectboxColumn(label=col_labels.get(k, k), options=role_choices, default="— (καμία)")
+              for k in grid_df.columns if k != "Υπάλληλος"}
+
+    edited = st.data_editor(
+        grid_df,
+        column_config={"Υπάλληλος": st.column_config.TextColumn("Υπάλληλος", disabled=True), **colcfg},
+        use_container_width=True, hide_index=True, num_rows="fixed"
+    )
+
+    cA, cB = st.columns([0.5, 0.5])
+    with cA:
+        if st.button(f"💾 Αποθήκευση εβδομάδας στη ΒΔ ({dates[0].isoformat()} → {dates[-1].isoformat()})", type="primary"):
+            errs = _validate_no_double_bookings(edited)
+            if errs:
+                for e in errs:
+                    st.error(e)
+            else:
+                assignments = _assignments_from_grid(edited, emps, dates[0])
+                if company.get("id", 0) < 0:
+                    st.info("Demo εταιρεία: η αποθήκευση στη ΒΔ είναι απενεργοποιημένη.")
+                else:
+                    bulk_save_week_schedule(company["id"], assignments, dates[0].isoformat(), dates[-1].isoformat())
+                st.success("✅ Αποθηκεύτηκε το εβδομαδιαίο πρόγραμμα στη βάση.")
+                st.rerun()
+        if mode == "📅 Μηνιαίο":
+            st.caption("Σημείωση: ο οπτικός επεξεργαστής αποθηκεύει **μόνο** την ορατή εβδομάδα. Για ολόκληρο μήνα, χρησιμοποίησε το κουμπί Δημιουργία (που αποθηκεύει 30 ημέρες).")
+    with cB:
+        if st.button("🔄 Φόρτωση από ΒΔ (εβδομάδα)"):
+            st.rerun()
+
+
+@st.fragment
+def _render_swap_requests(company: dict, emps: list, dates: list):
+    """Swap request/approval panel. As a fragment, typing a note reruns only this block."""
+    # ====== SHIFT SWAPS ======
+    active_shifts = company.get("active_shifts", [])
+    st.divider()
+    st.markdown("#### 🔁 Αιτήματα αλλαγής βάρδιας (ίδιο είδος βάρδιας)")  # (#19) clarify semantics
+
+    with st.expander("📝 Υποβολή αιτήματος (εργαζόμενου)", expanded=False):
+        st.caption("Ανταλλαγή γίνεται για **το ίδιο είδος βάρδιας** την ίδια ημέρα.")
+        emp_names = [e["name"] for e in emps]
+        req_emp = st.selectbox("Αιτών", emp_names, key="swap_req_emp")
+        target_emp = st.selectbox("Συνάδελφος", [n for n in emp_names if n != req_emp], key="swap_target_emp")
+        req_date = st.date_input("Ημερομηνία", dates[0], key="swap_date")
+        req_shift = st.selectbox("Βάρδια", active_shifts, key="swap_shift")
+
+        if st.button("📨 Υποβολή αιτήματος"):
+            ids = get_employee_id_map(company["id"])
+            rid, tid = ids.get(req_emp), ids.get(target_emp)
+            have = get_schedule_range(company["id"], req_date.isoformat(), req_date.isoformat())
+            target_has = any(x["employee_id"] == tid and x["shift"] == req_shift for x in have)
+            requester_has = any(x["employee_id"] == rid and x["shift"] == req_shift for x in have)
+            if not requester_has:
+                st.error("Ο αιτών δεν έχει αυτή τη βάρδια.")
+            elif not target_has:
+                st.error("Ο συνάδελφος δεν έχει αυτή τη βάρδια.")
+            else:
+                create_swap_request(company["id"], rid, tid, req_date.isoformat(), req_shift)
+                st.success("✅ Καταχωρήθηκε αίτημα αλλαγής (pending).")
+
+    with st.expander("📋 Εκκρεμή αιτήματα (manager)", expanded=True):
+        pending = list_swap_requests(company["id"], status="pending")
+        if not pending:
+            st.info("Καμία εκκρεμότητα.")
+        else:
+            for r in pending:
+                st.markdown(f"- **#{r['id']}** {r['date']} • *{r['shift']}* — {r['requester_name']} → {r['target_name']}")
+                c1, c2, c3 = st.columns([0.2, 0.2, 0.6])
+                note = c3.text_input("Σημείωση", key=f"note_{r['id']}")
+                if c1.button("✅ Έγκριση", key=f"ok_{r['id']}"):
+                    day_sched = get_schedule_range(company["id"], r["date"], r["date"])
+                    req_has = any(x["employee_id"] == r["requester_id"] and x["shift"] == r["shift"] for x in day_sched)
+                    target_has = any(x["employee_id"] == r["target_employee_id"] and x["shift"] == r["shift"] for x in day_sched)
+                    if not (req_has and target_has):
+                        st.error("Το ζεύγος βαρδιών δεν είναι έγκυρο πλέον.")
+                    else:
+                        apply_approved_swap(company["id"], r["date"], r["shift"], r["requester_id"], r["target_employee_id"],
+                                            request_id=r["id"], manager_note=note)
+                        st.success("✅ Εφαρμόστηκε.")
+                        st.rerun()
+                if c2.button("⛔️ Απόρριψη", key=f"reject_{r['id']}"):
+                    update_swap_status(r["id"], "rejected", note)
+                    st.info("Απορρίφθηκε.")
+                    st.rerun()
+
+
 def page_schedule():
     st.title("📅 Schedule Management")
     st.caption("Create and manage employee schedules with AI-powered optimization")
 
     # ---- Guards & init ----
-    st.session_state.setdefault("schedule", pd.DataFrame())
-    st.session_state.setdefault("missing_staff", pd.DataFrame())
-    st.session_state.setdefault("violations", pd.DataFrame())
+    for key in ("schedule", "missing_staff", "violations"):
+        if key not in st.session_state:  # don't construct throwaway empty frames on every rerun
+            st.session_state[key] = pd.DataFrame()
 
     if "company" not in st.session_state or not st.session_state.get("company", {}).get("name"):
         st.warning("⚠️ Please select a company from the sidebar.")
@@ -666,6 +850,26 @@ def page_schedule():
                     st.error(f"AI features unavailable: {str(e)}")
                     st.caption("Make sure OpenAI API key is configured in .env file")
 
+        # Earlier answers are kept in session state so reruns re-render them instead of re-asking
+        history = st.session_state.setdefault("ai_advice_history", [])
+        for past_q, past_a in history:
+            st.markdown(f"**{past_q}**")
+            st.markdown(past_a)
+
+        question = st.text_input("💬 Ask the AI about your schedule", key="ai_advice_question")
+        if st.button("Ask", key="ai_advice_ask") and question.strip():
+            from ai_scheduler import stream_ai_scheduling_advice
+
+            context = (
+                f"Work model: {company.get('work_model', '5ήμερο')}; "
+                f"employees: {len(emps)}; "
+                f"shifts: {', '.join(company.get('active_shifts', []))}; "
+                f"roles: {', '.join(company.get('roles', []))}"
+            )
+            st.markdown(f"**{question.strip()}**")
+            reply = st.write_stream(stream_ai_scheduling_advice(context, question.strip()))
+            history.append((question.strip(), reply if isinstance(reply, str) else "".join(map(str, reply))))
+
     # ====== Header controls ======
     st.divider()
     col1, col2 = st.columns(2)
@@ -681,7 +885,7 @@ def page_schedule():
     dates = [start_date + timedelta(days=i) for i in range(week_len)]
 
     # ====== Generator / Auto-fix wires ======
-    gen = generate_schedule  # (#15) Use local robust generator; remove undefined alias S
+    gen = _cached_generate_schedule  # (#15) Use local robust generator; remove undefined alias S
 
     # ====== Actions ======
     cgen, cfix = st.columns([0.35, 0.35])
@@ -699,11 +903,8 @@ def page_schedule():
     if generate_clicked and confirm_month:
         df, missing_df = gen(
             start_date,
-            emps,
-            company.get("active_shifts", []),
-            company.get("roles", []),
-            company.get("rules", {}),
-            company.get("role_settings", {}),
+            json.dumps(emps, ensure_ascii=False, sort_keys=True, default=str),
+            _settings_snapshot(company),
             days_count,
         )
 
@@ -724,22 +925,38 @@ def page_schedule():
         st.session_state.missing_staff = missing_df
         st.session_state.violations = viols
 
+        # Resolve names through an index of the loaded employees (first match wins, like the
+        # DB lookup) instead of one SELECT per schedule row; unknown names fall back to a
+        # single name -> id map of the company, loaded at most once.
+        ids_by_name: dict[str, int] = {}
+        for e in emps:
+            if e.get("id") is not None:
+                ids_by_name.setdefault(e.get("name", ""), e["id"])
+        db_ids: Optional[dict[str, int]] = None
+
         def _name_to_id(nm: str) -> Optional[int]:
-            return get_employee_id_by_name(company["id"], nm)
+            nonlocal db_ids
+            if nm in ids_by_name:
+                return ids_by_name[nm]
+            if db_ids is None:
+                db_ids = get_employee_id_map(company["id"])
+            return db_ids.get(nm)
 
         assignments = []
         period_start = start_date
         period_end = start_date + timedelta(days=days_count - 1)
-        for _, r in fixed_df.iterrows():
-            d = pd.to_datetime(r["Ημερομηνία"]).date()
-            if period_start <= d <= period_end and r.get("Βάρδια") in company.get("active_shifts", []):
-                eid = _name_to_id(r["Υπάλληλος"])
+        active = set(company.get("active_shifts", []))
+        row_dates = pd.to_datetime(fixed_df["Ημερομηνία"]).dt.date
+        row_roles = fixed_df["Ρόλος"] if "Ρόλος" in fixed_df.columns else [None] * len(fixed_df)
+        for d, shift, name, role in zip(row_dates, fixed_df["Βάρδια"], fixed_df["Υπάλληλος"], row_roles):
+            if period_start <= d <= period_end and shift in active:
+                eid = _name_to_id(name)
                 if eid:
                     assignments.append({
                         "employee_id": eid,
                         "date": d.isoformat(),
-                        "shift": r["Βάρδια"],
-                        "role": r.get("Ρόλος") or None,
+                        "shift": shift,
+                        "role": role or None,
                     })
         if company.get("id", 0) < 0:
             st.info("Demo εταιρεία: δημιουργήθηκε πρόγραμμα, αλλά η αποθήκευση στη ΒΔ είναι απενεργοποιημένη.")
@@ -770,7 +987,7 @@ def page_schedule():
         st.rerun()
 
     # ====== Enhanced KPIs & Analytics ======
-    sched = st.session_state.schedule.copy()
+    sched = st.session_state.schedule  # read-only below; consumers that mutate take their own copy
     st.divider()
     st.markdown("#### 📈 Επισκόπηση Προγράμματος")
     
@@ -834,98 +1051,7 @@ def page_schedule():
     if ADVANCED_FEATURES and not sched.empty:
         st.divider()
         render_employee_workload_comparison(sched, emps)
-    
-    # ====== Weekly Visual Builder ======
-    st.divider()
-    st.markdown("#### 🧱 Visual builder (εβδομαδιαίος πίνακας)")
-
-    active_shifts = company.get("active_shifts", [])
 
-    # Build initial grid from DB using unified helpers (#17)
-    grid_df = _grid_from_db_week(company["id"], emps, dates[0])
-
-    # Column labels for nicer headers
-    col_labels = { _column_key(d, s): f"{DAYS[d.weekday()]} {d.strftime('%d/%m')} • {s}"
-                   for d in dates for s in active_shifts }
-
-    role_choices = ["— (καμία)", "— (χωρίς ρόλο)"] + company.get("roles", [])
-    colcfg = {k: st.column_config.SelectboxColumn(label=col_labels.get(k, k), options=role_choices, default="— (καμία)")
-              for k in grid_df.columns if k != "Υπάλληλος"}
-
-    edited = st.data_editor(
-        grid_df,
-        column_config={"Υπάλληλος": st.column_config.TextColumn("Υπάλληλος", disabled=True), **colcfg},
-        use_container_width=True, hide_index=True, num_rows="fixed"
-    )
-
-    cA, cB = st.columns([0.5, 0.5])
-    with cA:
-        if st.button(f"💾 Αποθήκευση εβδομάδας στη ΒΔ ({dates[0].isoformat()} → {dates[-1].isoformat()})", type="primary"):
-            errs = _validate_no_double_bookings(edited)
-            if errs:
-                for e in errs:
-                    st.error(e)
-            else:
-                assignments = _assignments_from_grid(edited, emps, dates[0])
-                if company.get("id", 0) < 0:
-                    st.info("Demo εταιρεία: η αποθήκευση στη ΒΔ είναι απενεργοποιημένη.")
-                else:
-                    bulk_save_week_schedule(company["id"], assignments, dates[0].isoformat(), dates[-1].isoformat())
-                st.success("✅ Αποθηκεύτηκε το εβδομαδιαίο πρόγραμμα στη βάση.")
-                st.rerun()
-        if mode == "📅 Μηνιαίο":
-            st.caption("Σημείωση: ο οπτικός επεξεργαστής αποθηκεύει **μόνο** την ορατή εβδομάδα. Για ολόκληρο μήνα, χρησιμοποίησε το κουμπί Δημιουργία (που αποθηκεύει 30 ημέρες).")
-    with cB:
-        if st.button("🔄 Φόρτωση από ΒΔ (εβδομάδα)"):
-            st.rerun()
-
-    # ====== SHIFT SWAPS ======
-    st.divider()
-    st.markdown("#### 🔁 Αιτήματα αλλαγής βάρδιας (ίδιο είδος βάρδιας)")  # (#19) clarify semantics
-
-    with st.expander("📝 Υποβολή αιτήματος (εργαζόμενου)", expanded=False):
-        st.caption("Ανταλλαγή γίνεται για **το ίδιο είδος βάρδιας** την ίδια ημέρα.")
-        emp_names = [e["name"] for e in emps]
-        req_emp = st.selectbox("Αιτών", emp_names, key="swap_req_emp")
-        target_emp = st.selectbox("Συνάδελφος", [n for n in emp_names if n != req_emp], key="swap_target_emp")
-        req_date = st.date_input("Ημερομηνία", dates[0], key="swap_date")
-        req_shift = st.selectbox("Βάρδια", active_shifts, key="swap_shift")
-
-        if st.button("📨 Υποβολή αιτήματος"):
-            rid = get_employee_id_by_name(company["id"], req_emp)
-            tid = get_employee_id_by_name(company["id"], target_emp)
-            have = get_schedule_range(company["id"], req_date.isoformat(), req_date.isoformat())
-            target_has = any(x["employee_id"] == tid and x["shift"] == req_shift for x in have)
-            requester_has = any(x["employee_id"] == rid and x["shift"] == req_shift for x in have)
-            if not requester_has:
-                st.error("Ο αιτών δεν έχει αυτή τη βάρδια.")
-            elif not target_has:
-                st.error("Ο συνάδελφος δεν έχει αυτή τη βάρδια.")
-            else:
-                create_swap_request(company["id"], rid, tid, req_date.isoformat(), req_shift)
-                st.success("✅ Καταχωρήθηκε αίτημα αλλαγής (pending).")
-
-    with st.expander("📋 Εκκρεμή αιτήματα (manager)", expanded=True):
-        pending = list_swap_requests(company["id"], status="pending")
-        if not pending:
-            st.info("Καμία εκκρεμότητα.")
-        else:
-            for r in pending:
-                st.markdown(f"- **#{r['id']}** {r['date']} • *{r['shift']}* — {r['requester_name']} → {r['target_name']}")
-                c1, c2, c3 = st.columns([0.2, 0.2, 0.6])
-                note = c3.text_input("Σημείωση", key=f"note_{r['id']}")
-                if c1.button("✅ Έγκριση", key=f"ok_{r['id']}"):
-                    day_sched = get_schedule_range(company["id"], r["date"], r["date"])
-                    req_has = any(x["employee_id"] == r["requester_id"] and x["shift"] == r["shift"] for x in day_sched)
-                    target_has = any(x["employee_id"] == r["target_employee_id"] and x["shift"] == r["shift"] for x in day_sched)
-                    if not (req_has and target_has):
-                        st.error("Το ζεύγος βαρδιών δεν είναι έγκυρο πλέον.")
-                    else:
-                        update_swap_status(r["id"], "approved", note)
-                        apply_approved_swap(company["id"], r["date"], r["shift"], r["requester_id"], r["target_employee_id"])
-                        st.success("✅ Εφαρμόστηκε.")
-                        st.rerun()
-                if c2.button("⛔️ Απόρριψη", key=f"reject_{r['id']}"):
-                    update_swap_status(r["id"], "rejected", note)
-                    st.info("Απορρίφθηκε.")
-                    st.rerun()
+    # Builder and swap panels are fragments: their widget interactions don't rerun the page above
+    _render_week_builder(company, emps, dates, mode)
+    _render_swap_requests(company, emps, dates)